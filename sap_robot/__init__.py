@@ -0,0 +1,42 @@
+"""SAP Fiori shop-floor robot: voice/Telegram commands executed in SAP, through the Fiori UI
+or the OData confirmation service.
+
+Submodules load on first attribute access, so ``import sap_robot`` costs nothing and selenium
+is only imported once a browser is needed:
+
+    common      settings, UI texts, JsonFileStore, startup timings
+    robot       SapRobot (selenium)
+    pool        SapRobotPool
+    intents     fast-path intent parser and LLM intent cache
+    vocabulary  transcript correction
+    odata       OData backend executor and mock server
+    server      aiohttp server, command queue, journal and worker farm
+"""
+import importlib
+
+_SUBMODULES = ("common", "robot", "pool", "intents", "vocabulary", "odata", "server")
+
+_EXPORTS = {
+    "STARTUP": "common",
+    "SapRobot": "robot",
+    "SapRobotPool": "pool",
+    "resolve_intent": "intents",
+    "VOCABULARY_MATCHER": "vocabulary",
+    "ODataExecutor": "odata",
+    "build_app": "server",
+    "dispatch_action": "server",
+    "robot_pool": "server",
+    "serve": "server",
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module(f".{name}", __name__)
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted(set(globals()) | set(_SUBMODULES) | set(_EXPORTS))
@@ -0,0 +1,36 @@
+"""Command line for the robot server: ``python -m sap_robot`` (or the ``sap-robot`` script).
+
+    sap-robot [serve] [--host H] [--port P] [--no-prewarm]
+    sap-robot bench-intents | bench-vocab | bench-odata
+"""
+import argparse
+
+from .common import STARTUP
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="sap-robot", description="SAP Fiori robot server")
+    parser.add_argument("command", nargs="?", default="serve",
+                        choices=("serve", "bench-intents", "bench-vocab", "bench-odata"))
+    parser.add_argument("--host", help="bind address (default: SAP_ROBOT_HOST or localhost)")
+    parser.add_argument("--port", type=int, help="port (default: SAP_ROBOT_PORT or 5000)")
+    parser.add_argument("--no-prewarm", action="store_true",
+                        help="start browsers on the first command instead of during boot")
+    args = parser.parse_args(argv)
+
+    if args.command == "bench-intents":
+        from .intents import benchmark_intent_parser
+        benchmark_intent_parser()
+    elif args.command == "bench-vocab":
+        from .vocabulary import benchmark_vocabulary_matcher
+        benchmark_vocabulary_matcher()
+    elif args.command == "bench-odata":
+        from .odata import benchmark_odata_backend
+        benchmark_odata_backend()
+    else:
+        STARTUP.mark("interpreter")
+        from . import server
+        server.serve(host=args.host or server.SERVER_HOST, port=args.port or server.SERVER_PORT,
+                     prewarm=not args.no_prewarm)
+
+if __name__ == "__main__":
+    main()
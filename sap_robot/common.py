@@ -0,0 +1,135 @@
+##################################################################
+# sap_robot.common: settings and helpers shared by every module.
+# Stays free of heavy imports so the server can boot without selenium.
+##################################################################
+import json
+import os
+import tempfile
+import threading
+import time
+
+FLP_URL = os.environ.get("SAP_FLP_URL", 'https://aimprd.advapp.de/sap/bc/ui2/flp')
+SAP_USERNAME = os.environ.get("SAP_USERNAME", "")
+SAP_PASSWORD = os.environ.get("SAP_PASSWORD", "")
+
+# ▼▼▼ Startup Timings (process start -> ready for the first command) ▼▼▼
+def _process_age():
+    """Seconds since this process started (Linux /proc), 0.0 where that is not available."""
+    try:
+        with open("/proc/self/stat", encoding="ascii") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        return max(0.0, time.clock_gettime(time.CLOCK_BOOTTIME) - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError, AttributeError):
+        return 0.0
+
+class StartupTimings:
+    """Seconds from process start to each boot phase, first occurrence only. Once every phase
+    in `ready_after` is in, "ready" is recorded: the server can take its first command."""
+
+    def __init__(self):
+        self._t0 = time.perf_counter() - _process_age()
+        self._lock = threading.Lock()
+        self.phases = {}
+        self.ready_after = ("listening",)
+
+    def mark(self, phase):
+        with self._lock:
+            if phase in self.phases:
+                return
+            self.phases[phase] = round(time.perf_counter() - self._t0, 3)
+            ready = "ready" not in self.phases and all(p in self.phases for p in self.ready_after)
+            if ready:
+                self.phases["ready"] = self.phases[phase]
+        print(f"⏱️ Startup: {phase} at {self.phases[phase]:.3f}s")
+        if ready:
+            print(f"🚀 Ready for the first command {self.phases['ready']:.3f}s after process start "
+                  f"({', '.join(f'{p} {t:.3f}s' for p, t in self.phases.items() if p != 'ready')})")
+
+    def as_dict(self):
+        with self._lock:
+            return dict(self.phases)
+
+STARTUP = StartupTimings()
+
+# ▼▼▼ Central UI Translation Table (EN/DE) ▼▼▼
+UI_LANGUAGES = ("en", "de")
+
+UI_TEXTS = {
+    "search":           {"en": ["Search"], "de": ["Suchen"]},
+    "filter_search":    {"en": ["Search"], "de": ["Suchen", "Nach Filtern suchen"]},
+    "submit":           {"en": ["Submit"], "de": ["Senden"]},
+    "ok":               {"en": ["OK"], "de": ["OK"]},
+    "go":               {"en": ["Go"], "de": ["Start"]},
+    "close":            {"en": ["Close"], "de": ["Schließen"]},
+    "save":             {"en": ["Save"], "de": ["Speichern", "Sichern"]},
+    "adapt_filters":    {"en": ["Adapt Filters"], "de": ["Filter anpassen"]},
+    "operation":        {"en": ["Operation"], "de": ["Vorgang"]},
+    "next":             {"en": ["Next"], "de": ["Nächster"]},
+    "previous":         {"en": ["Previous"], "de": ["Vorheriger"]},
+    "qty_confirmation": {"en": ["Qty Confirmation"], "de": ["Mengenrückmeldung"]},
+    "yield":            {"en": ["Yield"], "de": ["Gutmenge"]},
+    "scrap":            {"en": ["Scrap"], "de": ["Ausschuss", "Ausschuß"]},
+    "rework":           {"en": ["Rework"], "de": ["Nacharbeit"]},
+    "reason":           {"en": ["Reason"], "de": ["Grund"]},
+    "select_reason":    {"en": ["Select Reason"], "de": ["Abweichungsgrund"]},
+    # Step buttons: EN reads "<verb> <phase>", DE reads "<phase> <verb>"
+    "phase:setup":      {"en": ["Setup"], "de": ["Rüsten"]},
+    "phase:processing": {"en": ["Processing"], "de": ["Bearbeitung", "Bearbeiten", "Verarbeitung"]},
+    "phase:teardown":   {"en": ["Teardown"], "de": ["Abrüsten"]},
+    "action:start":     {"en": ["Start"], "de": ["starten", "Starten"]},
+    "action:end":       {"en": ["Finish", "End"], "de": ["beenden", "Beenden", "abschließen"]},
+    # App tiles (参考截图 image_44c90d.png)
+    "app:Advanced Manufacturing":     {"en": ["Advanced Manufacturing"], "de": ["Advanced Manufacturing"]},
+    "app:Capture of production data": {"en": ["Capture of production data"], "de": ["Erfassung von Produktionsdaten"]},
+    "app:Business Documents":         {"en": ["Business Documents"], "de": ["Business Documents"]},  # 德语版也叫这个
+    "app:Production Monitor":         {"en": ["Production Monitor"], "de": ["Produktionsmonitor"]},
+}
+
+def ui_texts(key, lang=None, default=None):
+    """Texts for `key` in `lang`; both languages (EN first) while the language is unknown."""
+    entry = UI_TEXTS.get(key)
+    if entry is None:
+        return list(default or [])
+    if lang in entry:
+        return list(entry[lang])
+    texts = []
+    for l in UI_LANGUAGES:
+        texts += [t for t in entry.get(l, []) if t not in texts]
+    return texts
+
+# Set by the worker farm in each worker process: every worker keeps its own store files, so
+# processes never overwrite each other's entries.
+WORKER_ID = os.environ.get("SAP_ROBOT_WORKER_ID", "")
+
+class JsonFileStore:
+    """Small dict persisted as a JSON file (atomic replace of a private temp file on save).
+    In a farm worker the file name gets a ".worker<n>" suffix."""
+
+    def __init__(self, path, file_mode=None):
+        self.path = f"{path}.worker{WORKER_ID}" if WORKER_ID else path
+        self.file_mode = file_mode
+        self._lock = threading.Lock()
+        self._entries = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        tmp = None
+        try:
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)),
+                                       prefix=os.path.basename(self.path) + ".", suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                if self.file_mode is not None:
+                    os.chmod(tmp, self.file_mode)
+                json.dump(self._entries, f, ensure_ascii=False, indent=1)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"⚠️ Could not persist {os.path.basename(self.path)}: {e}")
+            if tmp is not None and os.path.exists(tmp):
+                os.remove(tmp)
@@ -0,0 +1,338 @@
+##################################################################
+# sap_robot.intents: Fast-Path Intent Parser (rules before the LLM)
+##################################################################
+import collections
+import copy
+import hashlib
+import os
+import re
+import time
+
+from .common import JsonFileStore
+
+# Same rules as Prompt_AI_Agent.txt, restricted to the actions SapRobot implements.
+# Anything ambiguous or outside that grammar returns None and goes to the LLM.
+INTENT_APP_ALIASES = {
+    "Capture of production data": ["capture of production data", "erfassung von produktionsdaten",
+                                   "produktionsdaten erfassen", "produktionsdaten"],
+    "Business Documents": ["business documents", "business dokumente", "business-dokumente",
+                           "belegdokumente", "dokumente"],
+    "Production Monitor": ["production monitor", "produktionsmonitor"],
+}
+
+INTENT_LLM_ONLY = re.compile(
+    r"\b(pausier\w*|pause|halte an|stopp?|resume|fortsetz\w*|fuehre fort|setze fort|login|logge|"
+    r"status|hilfe|help|fehlercode|errorcode|confluence|filter\w*|merkmal|characteristic)\b")
+INTENT_NEXT = re.compile(r"\b(naechste[rnms]?|weiter|next)\b")
+INTENT_PREVIOUS = re.compile(r"\b(vorherige[rnms]?|zurueck|back|previous)\b")
+INTENT_START = re.compile(r"\b(start|starte|starten|beginne|beginnen|begin)\b")
+INTENT_END = re.compile(r"\b(beende|beenden|ende|abschliessen|schliesse ab|finish|end)\b")
+INTENT_OPEN = re.compile(r"\b(oeffne|oeffnen|open)\b")
+INTENT_QTY_TRIGGER = re.compile(r"\b(buche\w*|mengen?|rueckmeldung|confirm quantities|book quantities)\b")
+
+INTENT_FIELDS = {
+    "order_id": re.compile(r"\b(?:auftrag(?:snummer)?|order(?: id)?)\b\s*(?:nr\.?|nummer|number)?\s*[:#]?\s*(\d+)"),
+    "operation_filter": re.compile(r"\b(?:vorgang|operation(?: id)?)\b\s*(?:nr\.?|nummer)?\s*[:#]?\s*(\d+)"),
+    "personnel_number": re.compile(r"\b(?:personalnummer|persnr|pn)\b\s*[:#]?\s*(\d+)"),
+    "op_plant": re.compile(r"\b(?:op\.? werk|op\.? plant|werk|plant)\b\s*[:#]?\s*([a-z0-9]+)"),
+}
+INTENT_QTY = {
+    "yield_qty": re.compile(r"\b(?:gutmenge|yield)\b\s*[:=]?\s*(\d+(?:[.,]\d+)?)"),
+    "scrap_qty": re.compile(r"\b(?:ausschuss|scrap)\b\s*[:=]?\s*(\d+(?:[.,]\d+)?)"),
+    "rework_qty": re.compile(r"\b(?:nacharbeit|rework)\b\s*[:=]?\s*(\d+(?:[.,]\d+)?)"),
+}
+# Prompt rule F: substring checks on the text without spaces, in priority order.
+INTENT_REASONS = [
+    ("Maschinenschaden", ("maschin", "stoerung", "defekt")),
+    ("Bedienungsfehler", ("bedien", "operator")),
+    ("Materialfehler", ("material",)),
+    ("Abfall", ("abfall",)),
+]
+
+def normalize_transcript(text):
+    """Lowercase, umlauts as ae/oe/ue/ss, punctuation dropped, single spaces."""
+    t = (text or "").lower()
+    for src, dst in (("ä", "ae"), ("ö", "oe"), ("ü", "ue"), ("ß", "ss")):
+        t = t.replace(src, dst)
+    t = re.sub(r"[^\w\s.:#,=-]", " ", t)
+    t = re.sub(r"(?<!\d)[.,](?!\d)", " ", t)
+    return re.sub(r"\s+", " ", t).strip()
+
+def _intent_fields(t):
+    fields = {name: (m.group(1) if m else "") for name, rx in INTENT_FIELDS.items() for m in [rx.search(t)]}
+    if not fields["order_id"]:
+        # "Rüsten starten 4711": one bare long number that no keyword claimed is the order.
+        claimed = {v for v in fields.values() if v}
+        bare = [n for n in re.findall(r"\b\d{4,}\b", t) if n not in claimed]
+        if len(bare) == 1:
+            fields["order_id"] = bare[0]
+    return fields
+
+def _intent_phase(t):
+    if re.search(r"abruesten|teardown", t):
+        return "teardown"
+    if re.search(r"verarbeitung|bearbeitung|processing", t):
+        return "processing"
+    return "setup"
+
+def _intent_reason(t):
+    compact = t.replace(" ", "")
+    for reason, needles in INTENT_REASONS:
+        if any(n in compact for n in needles):
+            return reason
+    return ""
+
+def parse_intent(text):
+    """Maps a transcript to {"action", "params"} like the LLM would, or None if the utterance
+    is outside the fast-path grammar or ambiguous. Order actions without a spoken order number
+    are left to the LLM too: the command schema requires order_id."""
+    t = normalize_transcript(text)
+    if not t or INTENT_LLM_ONLY.search(t):
+        return None
+
+    quantities = {name: m.group(1).replace(",", ".") for name, rx in INTENT_QTY.items()
+                  for m in [rx.search(t)] if m}
+    if quantities or INTENT_QTY_TRIGGER.search(t):
+        if not quantities:
+            return None  # "Mengen buchen" without any number: let the LLM ask/decide
+        if any(rx.search(t) for rx in (INTENT_START, INTENT_END, INTENT_NEXT, INTENT_PREVIOUS, INTENT_OPEN)):
+            return None  # "Rüsten Ende ... Gutmenge 5": a second step must not be dropped
+        fields = _intent_fields(t)
+        if not fields["order_id"]:
+            return None
+        return {"action": "qty_confirmation", "params": {
+            "order_id": fields["order_id"],
+            "operation_filter": fields["operation_filter"],
+            "yield_qty": quantities.get("yield_qty", "0"),
+            "scrap_qty": quantities.get("scrap_qty", "0"),
+            "rework_qty": quantities.get("rework_qty", "0"),
+            "reason": _intent_reason(t),
+        }}
+
+    is_next, is_prev = bool(INTENT_NEXT.search(t)), bool(INTENT_PREVIOUS.search(t))
+    is_start, is_end = bool(INTENT_START.search(t)), bool(INTENT_END.search(t))
+    is_open = bool(INTENT_OPEN.search(t))
+    if sum((is_next or is_prev, is_start or is_end, is_open)) > 1 or (is_next and is_prev) or (is_start and is_end):
+        return None
+
+    if is_next:
+        return {"action": "next_order", "params": {}}
+    if is_prev:
+        return {"action": "previous_order", "params": {}}
+
+    if is_start or is_end:
+        fields = _intent_fields(t)
+        if not fields["order_id"]:
+            return None
+        return {"action": "start_order" if is_start else "end_order", "params": {
+            "personnel_number": fields["personnel_number"] or "1",
+            "op_plant": fields["op_plant"],
+            "order_id": fields["order_id"],
+            "phase": _intent_phase(t),
+            "operation_filter": fields["operation_filter"],
+        }}
+
+    if is_open:
+        for app_name, aliases in INTENT_APP_ALIASES.items():
+            if any(normalize_transcript(alias) in t for alias in aliases):
+                fields = _intent_fields(t)
+                if not fields["order_id"]:
+                    return None
+                return {"action": "open_app", "params": {
+                    "app_name": app_name,
+                    "personnel_number": fields["personnel_number"] or "1",
+                    "op_plant": fields["op_plant"],
+                    "order_id": fields["order_id"],
+                    "operation_filter": fields["operation_filter"],
+                }}
+    return None
+
+# (utterance, expected action or None = must go to the LLM)
+INTENT_BENCH_SAMPLES = [
+    ("nächster Auftrag", "next_order"),
+    ("Next order", "next_order"),
+    ("weiter", "next_order"),
+    ("vorheriger Auftrag", "previous_order"),
+    ("zurück", "previous_order"),
+    ("Rüsten starten Auftrag 4711", "start_order"),
+    ("Starte Bearbeitung Auftrag 1000123 Vorgang 0020", "start_order"),
+    ("Beende Rüsten Auftrag 4711", "end_order"),
+    ("Abrüsten beenden Auftrag 4711 Personalnummer 12", "end_order"),
+    ("start processing order 1000123 operation 0010", "start_order"),
+    ("Gutmenge 20 Auftrag 4711", "qty_confirmation"),
+    ("Gutmenge 20", None),
+    ("Buche die Mengen Auftrag 4711 Vorgang 0010 Gutmenge 20 Ausschuss 2 Grund Maschinenschaden", "qty_confirmation"),
+    ("Mengen buchen Auftrag 4711 Gutmenge 3,5 Nacharbeit 1", "qty_confirmation"),
+    ("Mengen buchen Gutmenge 3,5 Nacharbeit 1", None),
+    ("book quantities order 4711 yield 10 scrap 1 reason operator", "qty_confirmation"),
+    ("Ausschuss 4 grundabfall", None),
+    ("Öffne Erfassung von Produktionsdaten Auftrag 4711", "open_app"),
+    ("öffne business dokumente", None),
+    ("open production monitor order 4711", "open_app"),
+    ("pausiere Auftrag 4711", None),
+    ("führe fort", None),
+    ("logge mich ein", None),
+    ("Status Auftrag 4711", None),
+    ("Mengen buchen", None),
+    ("Rüsten Ende Auftrag 4711 Gutmenge 5", None),
+    ("nächster und vorheriger", None),
+    ("öffne irgendwas", None),
+    ("Was ist der Fehlercode E42", None),
+    ("starte", None),
+]
+
+def benchmark_intent_parser(samples=INTENT_BENCH_SAMPLES, rounds=2000):
+    """Hit rate (share answered without the LLM), accuracy against the expected action and
+    mean parse latency over `rounds` passes. A hit only counts if the command schema accepts
+    it, as /execute would."""
+    from .server import CommandError, validate_command
+    hits = correct = 0
+    for text, expected in samples:
+        intent = parse_intent(text)
+        if intent is not None:
+            try:
+                validate_command(intent)
+            except CommandError as e:
+                print(f"   ✗ {text!r}: fast path answer rejected by the schema: {e}")
+                intent = None
+        action = intent["action"] if intent else None
+        hits += intent is not None
+        correct += action == expected
+        if action != expected:
+            print(f"   ✗ {text!r}: got {action}, expected {expected}")
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for text, _ in samples:
+            parse_intent(text)
+    per_call_us = (time.perf_counter() - t0) / (rounds * len(samples)) * 1e6
+    report = {"samples": len(samples), "hit_rate": round(hits / len(samples), 3),
+              "accuracy": round(correct / len(samples), 3), "mean_latency_us": round(per_call_us, 1)}
+    print(f"📊 Intent fast path: {report}")
+    return report
+
+# ▼▼▼ LLM Intent Cache (normalized transcript -> command) ▼▼▼
+# Shipped inside the package so an installed sap-robot finds it too.
+PROMPT_PATH = os.environ.get("SAP_ROBOT_PROMPT_PATH", os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "Prompt_AI_Agent.txt"))
+LLM_CACHE_PATH = os.environ.get(
+    "SAP_ROBOT_LLM_CACHE", os.path.join(os.path.expanduser("~"), ".sap_robot_llm_intents.json"))
+LLM_CACHE_SIZE = int(os.environ.get("SAP_ROBOT_LLM_CACHE_SIZE", "500"))
+LLM_CACHE_TTL = float(os.environ.get("SAP_ROBOT_LLM_CACHE_TTL", str(7 * 24 * 3600)))
+# Param values the prompt fills in when nothing was spoken; they may stay literal in a template.
+LLM_CACHE_DEFAULTS = {"0"}
+
+NUMBER_SLOT = re.compile(r"\d+(?:[.,]\d+)?")
+
+def prompt_version(path=PROMPT_PATH):
+    """Short hash of the agent prompt; a changed prompt invalidates cached LLM answers."""
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()[:12]
+    except OSError as e:
+        print(f"⚠️ Agent prompt not readable ({e}); cached LLM intents will not expire on prompt changes")
+        return "no-prompt"
+
+def slot_transcript(text):
+    """("auftrag <n0> gutmenge <n1>", ["4711", "20"]) for "Auftrag 4711, Gutmenge 20"."""
+    values = []
+
+    def _slot(m):
+        values.append(m.group(0).replace(",", "."))
+        return f"<n{len(values) - 1}>"
+
+    return NUMBER_SLOT.sub(_slot, normalize_transcript(text)), values
+
+class LlmIntentCache(JsonFileStore):
+    """LRU + TTL cache of LLM intents keyed by the slotted transcript, so "Gutmenge 20" and
+    "Gutmenge 30" share one entry. Persisted as JSON together with the prompt version;
+    a different prompt version starts empty."""
+
+    def __init__(self, path=LLM_CACHE_PATH, max_entries=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL, version=None):
+        self.version = version or prompt_version()
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        super().__init__(path)
+
+    def _load(self):
+        data = super()._load()
+        if data.get("version") != self.version:
+            return {"version": self.version, "items": collections.OrderedDict()}
+        return {"version": self.version, "items": collections.OrderedDict(data.get("items") or {})}
+
+    @property
+    def _items(self):
+        return self._entries["items"]
+
+    def get(self, text):
+        key, values = slot_transcript(text)
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None and time.time() - entry["ts"] > self.ttl:
+                del self._items[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            template = copy.deepcopy(entry["command"])
+        params = template.get("params") or {}
+        for name, value in params.items():
+            m = re.fullmatch(r"<n(\d+)>", value) if isinstance(value, str) else None
+            if m:
+                params[name] = values[int(m.group(1))]
+        return template
+
+    def put(self, text, command):
+        """Stores the command with the transcript's numbers turned into slots. Skipped when
+        the mapping would be ambiguous: the same number spoken twice, one spoken number in
+        several params (a default "0" next to a spoken "0"), a number that is not a string
+        and so cannot be traced to the transcript, a spoken number that no param took, or a
+        numeric param (other than a default) that is not spoken (e.g. "0010" for "Vorgang 10")."""
+        if not isinstance(command, dict) or not command.get("action"):
+            return False
+        key, values = slot_transcript(text)
+        if len(set(values)) != len(values):
+            return False
+        template = copy.deepcopy({"action": command["action"], "params": command.get("params") or {}})
+        slotted = set()
+        for name, value in template["params"].items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                return False
+            if isinstance(value, str) and value.replace(",", ".") in values:
+                slot = values.index(value.replace(",", "."))
+                if slot in slotted:
+                    return False
+                slotted.add(slot)
+                template["params"][name] = f"<n{slot}>"
+            elif isinstance(value, str) and re.fullmatch(r"\d+([.,]\d+)?", value) and value not in LLM_CACHE_DEFAULTS:
+                return False
+        if len(slotted) != len(values):
+            return False
+        with self._lock:
+            self._items[key] = {"command": template, "ts": time.time()}
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+            self._save()
+        return True
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"size": len(self._items), "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+                "prompt_version": self.version}
+
+LLM_INTENT_CACHE = LlmIntentCache()
+
+def resolve_intent(text):
+    """Fast path first, then the LLM intent cache: (command, source) or (None, None)."""
+    command = parse_intent(text)
+    if command is not None:
+        return command, "rules"
+    command = LLM_INTENT_CACHE.get(text)
+    if command is not None:
+        return command, "cache"
+    return None, None
@@ -0,0 +1,362 @@
+##################################################################
+# sap_robot.odata: OData Backend (confirmations without a browser)
+##################################################################
+import http.server
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+from .common import FLP_URL, SAP_PASSWORD, SAP_USERNAME
+from .pool import POOL_SIZE
+
+# "selenium": every action drives the Fiori UI. "odata": confirmations go straight to the
+# backend service and only fall back to the browser for what it cannot express.
+BACKEND_MODE = os.environ.get("SAP_ROBOT_BACKEND", "selenium")
+ODATA_BASE_URL = os.environ.get(
+    "SAP_ROBOT_ODATA_URL",
+    f"{urlsplit(FLP_URL).scheme}://{urlsplit(FLP_URL).netloc}/sap/opu/odata/sap/API_PROD_ORDER_CONFIRMATION_2_SRV")
+ODATA_CLIENT = os.environ.get("SAP_ROBOT_ODATA_CLIENT", "")
+ODATA_POOL_SIZE = int(os.environ.get("SAP_ROBOT_ODATA_POOL", str(POOL_SIZE * 2)))
+ODATA_TIMEOUT = float(os.environ.get("SAP_ROBOT_ODATA_TIMEOUT", "15"))
+ODATA_VERIFY_TLS = os.environ.get("SAP_ROBOT_ODATA_VERIFY", "1") != "0"
+ODATA_CONFIRMATION_SET = "ProdnOrdConf2"
+
+# Command param -> ProdnOrdConf2 property.
+ODATA_QTY_FIELDS = {
+    "order_id": "OrderID",
+    "operation_filter": "OrderOperation",
+    "yield_qty": "ConfirmationYieldQuantity",
+    "scrap_qty": "ConfirmationScrapQuantity",
+    "rework_qty": "ConfirmationReworkQuantity",
+}
+# Spoken reason -> VarianceReasonCode, e.g. '{"Maschinenschaden": "0001"}'. A reason without a
+# code here is left to the browser (which reads the reason catalogue).
+ODATA_REASON_CODES = json.loads(os.environ.get("SAP_ROBOT_ODATA_REASON_CODES", "{}"))
+# "start:setup" -> extra properties of the time-event confirmation posted to ODATA_STEP_SET, e.g.
+# '{"start:setup": {"OrderConfirmationRecordType": "B10"}}'. Unmapped steps use the browser.
+ODATA_STEP_EVENTS = json.loads(os.environ.get("SAP_ROBOT_ODATA_STEP_EVENTS", "{}"))
+ODATA_STEP_SET = os.environ.get("SAP_ROBOT_ODATA_STEP_SET", ODATA_CONFIRMATION_SET)
+
+class ODataError(RuntimeError):
+    """Backend answered with an HTTP error. 4xx are business errors reported to the caller.
+    The browser only takes over when the write provably never reached the service (`sent`
+    False, or 503); any other failure may already be booked."""
+
+    def __init__(self, status, message, sent=True):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+        self.sent = sent
+
+def _odata_quantity(value):
+    return str(value or "0").replace(",", ".")
+
+class ODataExecutor:
+    """Posts confirmations to the OData service behind "Capture of production data" through one
+    keep-alive requests.Session (pooled connections, CSRF token fetched once and refreshed when
+    the server asks for it). plan() turns a command into (entity set, payload) requests or None
+    when the command needs the browser; execute()/execute_batch() post them, the latter as one
+    $batch round-trip."""
+
+    def __init__(self, base_url=ODATA_BASE_URL, username=None, password=None, client=ODATA_CLIENT,
+                 pool_size=ODATA_POOL_SIZE, timeout=ODATA_TIMEOUT, verify=ODATA_VERIFY_TLS):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.exceptions import ConnectTimeoutError
+
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.verify = verify
+        self.session.headers.update({"Accept": "application/json"})
+        username = SAP_USERNAME if username is None else username
+        password = SAP_PASSWORD if password is None else password
+        if username:
+            self.session.auth = (username, password)
+        if client:
+            self.session.params = {"sap-client": client}
+        self._transport_errors = (requests.RequestException,)
+        # Raised before a byte of the request went out (refused, DNS, connect timeout).
+        self._connect_errors = (requests.ConnectTimeout, ConnectTimeoutError)
+        self._csrf = None
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "csrf_fetches": 0, "batches": 0, "fallbacks": 0, "errors": 0, "uncertain": 0}
+
+    # ---------- HTTP ----------
+    def _token(self, refresh=False):
+        with self._lock:
+            if self._csrf is None or refresh:
+                resp = self.session.get(self.base_url + "/", headers={"X-CSRF-Token": "Fetch"}, timeout=self.timeout)
+                self.stats["csrf_fetches"] += 1
+                if resp.status_code >= 400:
+                    raise ODataError(resp.status_code, "CSRF token fetch failed", sent=False)
+                self._csrf = resp.headers.get("X-CSRF-Token")
+            return self._csrf
+
+    def _post(self, path, data, content_type):
+        for attempt in range(2):
+            try:
+                token = self._token(refresh=attempt > 0)
+            except self._transport_errors as e:
+                # Nothing was written yet (a 403 before this answered without side effects).
+                raise ODataError(0, f"CSRF token fetch failed: {e.__class__.__name__}", sent=False) from e
+            resp = self.session.post(f"{self.base_url}/{path}", data=data, timeout=self.timeout,
+                                     headers={"X-CSRF-Token": token, "Content-Type": content_type})
+            self.stats["requests"] += 1
+            if resp.status_code == 403 and resp.headers.get("X-CSRF-Token", "").lower() == "required":
+                continue   # token expired with the server session: fetch a new one once
+            return resp
+        return resp
+
+    @staticmethod
+    def _error_message(text):
+        try:
+            return json.loads(text)["error"]["message"]["value"]
+        except (ValueError, KeyError, TypeError):
+            return (text or "").strip()[:200]
+
+    def create(self, entity_set, payload):
+        resp = self._post(entity_set, json.dumps(payload), "application/json")
+        if resp.status_code >= 400:
+            raise ODataError(resp.status_code, self._error_message(resp.text))
+        return (resp.json() if resp.content else {}).get("d", {})
+
+    def batch(self, requests_, atomic=True):
+        """POSTs [(entity set, payload)] in one $batch: one changeset (all or nothing) if atomic,
+        else one changeset per request. Returns [(status, body)] in request order."""
+        boundary = f"batch_{uuid.uuid4().hex}"
+        groups = [requests_] if atomic else [[r] for r in requests_]
+        lines = []
+        for group in groups:
+            changeset = f"changeset_{uuid.uuid4().hex}"
+            lines += [f"--{boundary}", f"Content-Type: multipart/mixed; boundary={changeset}", ""]
+            for entity_set, payload in group:
+                lines += [f"--{changeset}", "Content-Type: application/http", "Content-Transfer-Encoding: binary", "",
+                          f"POST {entity_set} HTTP/1.1", "Content-Type: application/json",
+                          "Accept: application/json", "", json.dumps(payload)]
+            lines += [f"--{changeset}--", ""]
+        lines.append(f"--{boundary}--")
+        resp = self._post("$batch", "\r\n".join(lines).encode(), f"multipart/mixed; boundary={boundary}")
+        self.stats["batches"] += 1
+        if resp.status_code >= 400:
+            raise ODataError(resp.status_code, self._error_message(resp.text))
+        parts = parse_batch_response(resp.text)
+        if atomic and len(parts) == 1 and len(requests_) > 1:
+            parts = parts * len(requests_)   # a failed changeset answers once for all its requests
+        return parts
+
+    def _unsent(self, error):
+        """True only if the write provably never reached SAP, so the browser may run it instead."""
+        if isinstance(error, ODataError):
+            return not error.sent or error.status == 503
+        if isinstance(error, self._connect_errors):
+            return True
+        reason = getattr(error.args[0], "reason", None) if error.args else None
+        return isinstance(reason, self._connect_errors)
+
+    def _failed(self, what, error):
+        """None (browser fallback) if nothing was sent, else an error result: a 5xx, a read
+        timeout or a dropped connection after the POST may already have been booked."""
+        self.stats["errors"] += 1
+        if self._unsent(error):
+            print(f"⚠️ OData backend unavailable ({error.__class__.__name__}), using the browser")
+            self.stats["fallbacks"] += 1
+            return None
+        self.stats["uncertain"] += 1
+        return {"status": "error", "backend": "odata",
+                "message": f"OData {what} failed after it was sent ({error}); check SAP before retrying"}
+
+    # ---------- commands ----------
+    def plan(self, command):
+        """[(entity set, payload)] for a validated command, or None if it needs the browser."""
+        action = command.get("action")
+        params = command.get("params") or {}
+        if not params.get("order_id") or not params.get("operation_filter"):
+            return None
+        if action == "qty_confirmation":
+            payload = {prop: str(params.get(name) or "") for name, prop in ODATA_QTY_FIELDS.items()}
+            for name in ("yield_qty", "scrap_qty", "rework_qty"):
+                payload[ODATA_QTY_FIELDS[name]] = _odata_quantity(params.get(name))
+            if params.get("reason"):
+                code = ODATA_REASON_CODES.get(params["reason"])
+                if code is None:
+                    return None
+                payload["VarianceReasonCode"] = code
+            return [(ODATA_CONFIRMATION_SET, payload)]
+        if action in ("start_order", "end_order"):
+            step = f"{'start' if action == 'start_order' else 'end'}:{params.get('phase') or 'processing'}"
+            if step not in ODATA_STEP_EVENTS:
+                return None
+            payload = {"OrderID": str(params["order_id"]), "OrderOperation": str(params["operation_filter"])}
+            payload.update(ODATA_STEP_EVENTS[step])
+            return [(ODATA_STEP_SET, payload)]
+        return None
+
+    def execute(self, command):
+        """Result dict like the robot's, or None when the browser has to run the command."""
+        planned = self.plan(command)
+        if planned is None:
+            return None
+        t0 = time.perf_counter()
+        try:
+            body = self.create(*planned[0])
+        except ODataError as e:
+            if e.sent and 400 <= e.status < 500:
+                self.stats["errors"] += 1
+                return {"status": "error", "message": f"OData rejected {command['action']}: {e}", "backend": "odata"}
+            return self._failed(command["action"], e)
+        except self._transport_errors as e:
+            return self._failed(command["action"], e)
+        return {"status": "success", "message": f"{command['action']} posted via OData", "backend": "odata",
+                "confirmation": {k: body.get(k) for k in ("ConfirmationGroup", "ConfirmationCount") if k in body},
+                "duration_s": round(time.perf_counter() - t0, 3)}
+
+    def execute_batch(self, commands, on_error="stop"):
+        """run_batch-shaped result for a batch whose steps all map to OData, else None."""
+        plans = [self.plan(c) for c in commands]
+        if any(p is None for p in plans):
+            return None
+        t0 = time.perf_counter()
+        try:
+            parts = self.batch([p[0] for p in plans], atomic=on_error == "stop")
+        except (ODataError, *self._transport_errors) as e:
+            if isinstance(e, ODataError) and 400 <= e.status < 500:
+                e.sent = False   # the envelope itself was refused: no changeset ran
+            return self._failed("$batch", e)
+        steps = []
+        for index, (command, (status, body)) in enumerate(zip(commands, parts)):
+            ok = status < 400
+            steps.append({"index": index, "action": command.get("action"), "ok": ok,
+                          "result": {"status": "success" if ok else "error",
+                                     "message": f"HTTP {status}" + ("" if ok else f": {self._error_message(body)}")},
+                          "duration_s": 0.0})
+        succeeded = sum(step["ok"] for step in steps)
+        status = "success" if succeeded == len(commands) else "partial" if succeeded else "error"
+        return {"status": status, "message": f"{succeeded}/{len(commands)} steps succeeded", "steps": steps,
+                "skipped": 0, "backend": "odata", "duration_s": round(time.perf_counter() - t0, 3)}
+
+def parse_batch_response(text):
+    """[(status, body)] for every application/http part of an OData $batch response."""
+    parts = []
+    for m in re.finditer(r"HTTP/1\.1 (\d{3})[^\r\n]*\r?\n(.*?)(?=\r?\n--|\Z)", text, re.S):
+        chunks = re.split(r"\r?\n\r?\n", m.group(2), maxsplit=1)
+        parts.append((int(m.group(1)), chunks[1].strip() if len(chunks) > 1 else ""))
+    return parts
+
+# ▼▼▼ Mock OData server (local testing and benchmarks) ▼▼▼
+class MockODataServer:
+    """Minimal stand-in for API_PROD_ORDER_CONFIRMATION_2_SRV on localhost: CSRF fetch, POST to
+    any entity set and $batch with changesets. Orders listed in `unknown_orders` are answered
+    with 400 like the real service; posted payloads are kept in `created`."""
+
+    def __init__(self, port=0, unknown_orders=()):
+        self.created = []
+        self.unknown_orders = set(unknown_orders)
+        self.token = uuid.uuid4().hex
+        mock = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True   # keep-alive replies must not wait for delayed ACKs
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body="", content_type="application/json", headers=()):
+                data = body.encode()
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._send(200, json.dumps({"d": {"EntitySets": [ODATA_CONFIRMATION_SET]}}),
+                           headers=[("X-CSRF-Token", mock.token)])
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+                if self.headers.get("X-CSRF-Token") != mock.token:
+                    return self._send(403, "CSRF token validation failed", "text/plain", [("X-CSRF-Token", "Required")])
+                if self.path.split("?")[0].endswith("/$batch"):
+                    return self._send(202, *mock._batch(body))
+                status, reply = mock._create(json.loads(body or "{}"))
+                self._send(status, json.dumps(reply))
+
+        self.httpd = http.server.ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/sap/opu/odata/sap/API_PROD_ORDER_CONFIRMATION_2_SRV"
+
+    def _create(self, payload):
+        if payload.get("OrderID") in self.unknown_orders:
+            return 400, {"error": {"message": {"value": f"Order {payload['OrderID']} does not exist"}}}
+        record = dict(payload, ConfirmationGroup=str(len(self.created) + 1), ConfirmationCount="1")
+        self.created.append(record)
+        return 201, {"d": record}
+
+    def _batch(self, body):
+        boundary = f"batchresponse_{uuid.uuid4().hex}"
+        out = []
+        for changeset in re.split(r"--batch_\w+", body):
+            payloads = [json.loads(m) for m in re.findall(r"HTTP/1\.1\r?\n(?:[^\r\n]+\r?\n)*\r?\n(\{.*?\})\r?\n", changeset, re.S)]
+            if not payloads:
+                continue
+            results = [self._create(p) for p in payloads]
+            failed = next((r for r in results if r[0] >= 400), None)
+            if failed:   # a changeset is all or nothing
+                self.created = self.created[:len(self.created) - sum(r[0] < 400 for r in results)]
+                results = [failed]
+            cs = f"changesetresponse_{uuid.uuid4().hex}"
+            out += [f"--{boundary}", f"Content-Type: multipart/mixed; boundary={cs}", ""]
+            for status, reply in results:
+                out += [f"--{cs}", "Content-Type: application/http", "Content-Transfer-Encoding: binary", "",
+                        f"HTTP/1.1 {status} {'Created' if status < 400 else 'Bad Request'}",
+                        "Content-Type: application/json", "", json.dumps(reply)]
+            out += [f"--{cs}--", ""]
+        out.append(f"--{boundary}--")
+        return "\r\n".join(out), f"multipart/mixed; boundary={boundary}"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, name="mock-odata", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def benchmark_odata_backend(count=200):
+    """Confirmations per second against the mock server: one POST each, then one $batch."""
+    server = MockODataServer().start()
+    try:
+        executor = ODataExecutor(server.url, username="", password="")
+        command = {"action": "qty_confirmation",
+                   "params": {"order_id": "1000001", "operation_filter": "0010", "yield_qty": "5",
+                              "scrap_qty": "0", "rework_qty": "0", "reason": ""}}
+        t0 = time.perf_counter()
+        for _ in range(count):
+            assert executor.execute(command)["status"] == "success"
+        single_ms = (time.perf_counter() - t0) / count * 1000
+        t0 = time.perf_counter()
+        batched = executor.execute_batch([command] * count)
+        batch_ms = (time.perf_counter() - t0) * 1000
+        report = {"confirmations": count, "post_ms_each": round(single_ms, 2),
+                  "batch_ms_total": round(batch_ms, 1), "batch_status": batched["status"],
+                  "created": len(server.created), "csrf_fetches": executor.stats["csrf_fetches"]}
+    finally:
+        server.stop()
+    print(f"📊 OData backend (mock): {report}")
+    return report
+
+odata_backend = None
+if BACKEND_MODE == "odata":
+    try:
+        odata_backend = ODataExecutor()
+    except ImportError:
+        print("!! SAP_ROBOT_BACKEND=odata needs the 'requests' package; using the browser only.")
@@ -0,0 +1,196 @@
+##################################################################
+# sap_robot.pool: Session Pool (one warm browser per operator)
+##################################################################
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from .common import SAP_PASSWORD, SAP_USERNAME, STARTUP
+
+POOL_SIZE = int(os.environ.get("SAP_ROBOT_POOL_SIZE", "2"))
+POOL_IDLE_TIMEOUT = float(os.environ.get("SAP_ROBOT_IDLE_TIMEOUT", "1800"))
+
+class SapRobotPool:
+    """Up to `size` SapRobot instances, each with its own Chrome, bound to an operator key
+    (personnel number or chat id). Spare robots are started and logged in ahead of time,
+    idle bindings are evicted, and every hand-out is health-checked."""
+
+    def __init__(self, size=POOL_SIZE, idle_timeout=POOL_IDLE_TIMEOUT,
+                 username=SAP_USERNAME, password=SAP_PASSWORD):
+        self.size = max(1, size)
+        self.idle_timeout = idle_timeout
+        self.username = username
+        self.password = password
+        self._bound = {}    # key -> {"robot": SapRobot|None, "busy": bool, "last_used": float}
+        self._spares = []
+        self._warming = 0
+        self._cond = threading.Condition()
+
+    def _total(self):
+        return len(self._bound) + len(self._spares) + self._warming
+
+    def _warm_robot(self):
+        from .robot import SapRobot   # selenium: imported with the first browser, not at boot
+        started = time.time()
+        robot = SapRobot(shared=False)
+        if self.username and self.password:
+            # Restores the saved session when it is still alive, logs in otherwise.
+            robot._credentials = (self.username, self.password)
+            result = robot.ensure_session(force=True)
+            if result is not None:
+                print(f"⚠️ Pre-login failed: {result.get('message')}")
+        else:
+            robot._start_driver_if_not_running()
+        print(f"🔥 Warm robot ready in {time.time() - started:.1f}s")
+        return robot
+
+    def prewarm(self, count=None):
+        """Starts spare robots in the background until `count` (default: pool size) exist."""
+        target = self.size if count is None else min(count, self.size)
+        with self._cond:
+            missing = max(0, target - self._total())
+            self._warming += missing
+        for _ in range(missing):
+            threading.Thread(target=self._warm_spare, name="sap-robot-prewarm", daemon=True).start()
+
+    def wait_warm(self, timeout=None):
+        """Blocks until a spare robot is warm (True) or none is warming any more (False)."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._spares or not self._warming, timeout) and bool(self._spares)
+
+    def _warm_spare(self):
+        robot = None
+        try:
+            robot = self._warm_robot()
+        except Exception as e:
+            print(f"!! Pre-warm failed: {e}")
+        with self._cond:
+            self._warming -= 1
+            if robot is not None:
+                self._spares.append(robot)
+            self._cond.notify_all()
+        if robot is not None:
+            STARTUP.mark("first_robot_warm")
+
+    def _evict_idle(self):
+        # Unbinds idle sessions under the lock; the caller quits the returned robots after
+        # releasing it (quitting Chrome and saving the session must not block the pool).
+        now = time.time()
+        evicted = []
+        for key, entry in list(self._bound.items()):
+            if not entry["busy"] and now - entry["last_used"] > self.idle_timeout:
+                print(f"💤 Evicting idle session '{key}'")
+                del self._bound[key]
+                if entry["robot"] is not None:
+                    evicted.append(entry["robot"])
+        return evicted
+
+    def _unbind_lru(self):
+        # Hands the least recently used idle browser back as a spare (still logged in).
+        idle = [(e["last_used"], k) for k, e in self._bound.items() if not e["busy"]]
+        if not idle:
+            return False
+        _, key = min(idle)
+        entry = self._bound.pop(key)
+        if entry["robot"] is not None:
+            self._spares.append(entry["robot"])
+        print(f"↪️ Session '{key}' unbound to make room")
+        return True
+
+    def acquire(self, key):
+        """Returns the robot bound to `key`, binding a spare or starting a new one if needed.
+        Blocks while the key's robot is busy or the pool is full of busy robots."""
+        evicted = []
+        with self._cond:
+            while True:
+                evicted += self._evict_idle()
+                entry = self._bound.get(key)
+                if entry is not None:
+                    if not entry["busy"]:
+                        break
+                elif self._spares:
+                    robot = self._spares.pop()
+                    # A spare may come from another operator (_unbind_lru): whatever app and
+                    # personnel number its browser shows is not this key's position.
+                    robot.page_state.reset()
+                    entry = self._bound[key] = {"robot": robot, "busy": False, "last_used": time.time()}
+                    break
+                elif self._total() < self.size:
+                    entry = self._bound[key] = {"robot": None, "busy": False, "last_used": time.time()}
+                    break
+                elif self._unbind_lru():
+                    continue
+                self._cond.wait()
+            entry["busy"] = True
+
+        for robot in evicted:
+            robot.quit()
+        robot = entry["robot"]
+        if robot is None or not robot.is_alive():
+            if robot is not None:
+                print(f"⚠️ Session '{key}' failed health check, restarting browser...")
+                robot.quit()
+            try:
+                robot = self._warm_robot()
+            except Exception:
+                with self._cond:
+                    self._bound.pop(key, None)
+                    self._cond.notify_all()
+                raise
+            entry["robot"] = robot
+        self.prewarm()
+        return robot
+
+    def release(self, key):
+        with self._cond:
+            entry = self._bound.get(key)
+            if entry is not None:
+                entry["busy"] = False
+                entry["last_used"] = time.time()
+            self._cond.notify_all()
+
+    @contextmanager
+    def session(self, key):
+        robot = self.acquire(key)
+        try:
+            yield robot
+        finally:
+            self.release(key)
+
+    def status(self):
+        with self._cond:
+            return {
+                "size": self.size,
+                "bound": {k: {"busy": e["busy"], "idle_s": round(time.time() - e["last_used"], 1)}
+                          for k, e in self._bound.items()},
+                "spares": len(self._spares),
+                "warming": self._warming,
+            }
+
+    def health(self):
+        """Driver state per robot. Busy robots are reported without probing their browser."""
+        with self._cond:
+            bound = {k: (e["robot"], e["busy"]) for k, e in self._bound.items()}
+            spares = list(self._spares)
+            warming = self._warming
+        sessions = {}
+        for key, (robot, busy) in bound.items():
+            if busy:
+                sessions[key] = "busy"
+            else:
+                sessions[key] = "alive" if robot is not None and robot.is_alive() else "down"
+        return {
+            "sessions": sessions,
+            "spares_alive": sum(1 for robot in spares if robot.is_alive()),
+            "spares": len(spares),
+            "warming": warming,
+        }
+
+    def quit_all(self):
+        with self._cond:
+            robots = [e["robot"] for e in self._bound.values() if e["robot"] is not None] + self._spares
+            self._bound.clear()
+            self._spares = []
+        for robot in robots:
+            robot.quit()
@@ -0,0 +1,1818 @@
+##################################################################
+# sap_robot.robot: Action Layer (Bilingual App Tile Fix)
+# The only module that imports selenium; it loads with the first browser.
+##################################################################
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.common.keys import Keys
+from selenium.webdriver.common.action_chains import ActionChains
+import difflib
+import json
+import os
+import re
+import string
+import threading
+import time
+from urllib.parse import quote, urlsplit
+from webdriver_manager.chrome import ChromeDriverManager
+from selenium.webdriver.chrome.options import Options
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from .common import FLP_URL, SAP_PASSWORD, SAP_USERNAME, UI_LANGUAGES, UI_TEXTS, JsonFileStore, ui_texts
+
+SHARED_DRIVER = None
+
+# "interactive": maximized, detached, headed Chrome for debugging.
+# "server": headless, no images/remote fonts/extensions, eager page loads.
+DRIVER_MODE = os.environ.get("SAP_ROBOT_DRIVER_MODE", "interactive")
+DRIVER_PATH_CACHE = os.environ.get(
+    "SAP_ROBOT_DRIVER_CACHE", os.path.join(os.path.expanduser("~"), ".sap_robot_chromedriver"))
+_DRIVER_PATH = None
+# Pre-warm starts several browsers at once; only one of them may download chromedriver.
+_DRIVER_LOCK = threading.Lock()
+
+def resolve_driver_path(refresh=False):
+    """Resolves chromedriver once: in-process memo first, then the path cached on disk,
+    and only then ChromeDriverManager (network lookup)."""
+    global _DRIVER_PATH
+    if not refresh and _DRIVER_PATH and os.path.exists(_DRIVER_PATH):
+        return _DRIVER_PATH
+    with _DRIVER_LOCK:
+        if not refresh:
+            if _DRIVER_PATH and os.path.exists(_DRIVER_PATH):
+                return _DRIVER_PATH
+            try:
+                with open(DRIVER_PATH_CACHE, encoding="utf-8") as f:
+                    cached = f.read().strip()
+                if cached and os.path.exists(cached):
+                    _DRIVER_PATH = cached
+                    return _DRIVER_PATH
+            except OSError:
+                pass
+
+        _DRIVER_PATH = ChromeDriverManager().install()
+        # Written aside and renamed so farm workers never read a half-written path.
+        tmp = f"{DRIVER_PATH_CACHE}.{os.getpid()}"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(_DRIVER_PATH)
+            os.replace(tmp, DRIVER_PATH_CACHE)
+        except OSError as e:
+            print(f"⚠️ Could not cache chromedriver path: {e}")
+        return _DRIVER_PATH
+
+def build_chrome_options(mode=DRIVER_MODE):
+    chrome_options = Options()
+    chrome_options.add_experimental_option("excludeSwitches", ["enable-logging"])
+    if mode == "server":
+        chrome_options.add_argument("--headless=new")
+        chrome_options.add_argument("--window-size=1920,1080")
+        chrome_options.add_argument("--disable-extensions")
+        chrome_options.add_argument("--disable-remote-fonts")
+        chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+        chrome_options.add_argument("--disable-gpu")
+        chrome_options.add_argument("--no-first-run")
+        chrome_options.add_experimental_option(
+            "prefs", {"profile.managed_default_content_settings.images": 2})
+        chrome_options.page_load_strategy = "eager"
+    else:
+        chrome_options.add_argument("--start-maximized")
+        chrome_options.add_experimental_option("detach", True)
+    return chrome_options
+
+def step_button_texts(action_type, phase, lang=None):
+    verbs = UI_TEXTS.get(f"action:{action_type}", {})
+    phases = UI_TEXTS.get(f"phase:{phase}", {})
+    texts = []
+    for l in ([lang] if lang in UI_LANGUAGES else UI_LANGUAGES):
+        for v in verbs.get(l, []):
+            for p in phases.get(l, []):
+                t = f"{v} {p}" if l == "en" else f"{p} {v}"
+                if t not in texts:
+                    texts.append(t)
+    return texts
+
+def xp_any(expr, texts, op="="):
+    """XPath predicate matching any text: "expr='A' or expr='B'" (op="contains" for substrings)."""
+    if op == "contains":
+        return " or ".join(f"contains({expr}, '{t}')" for t in texts)
+    return " or ".join(f"{expr}='{t}'" for t in texts)
+
+# sap-language URL parameter first, then the UI5 core configuration ('' before UI5 has loaded).
+UI_LANGUAGE_SCRIPT = """
+var m = /[?&]sap-language=([^&#]*)/i.exec(window.location.search);
+if (m) return m[1];
+var c = window.sap && sap.ui && sap.ui.getCore && sap.ui.getCore();
+return (c && c.getConfiguration && c.getConfiguration().getLanguage()) || '';
+"""
+
+LOCATOR_CACHE_PATH = os.environ.get(
+    "SAP_ROBOT_LOCATOR_CACHE", os.path.join(os.path.expanduser("~"), ".sap_robot_locators.json"))
+
+class LocatorCache(JsonFileStore):
+    """Remembers which candidate locator last won per (logical target, UI language) so it is
+    tried first next time. Persisted as a small JSON file; an entry is dropped when it fails."""
+
+    def __init__(self, path=LOCATOR_CACHE_PATH):
+        super().__init__(path)
+
+    @staticmethod
+    def _key(target, lang):
+        return f"{lang}|{target}"
+
+    def ordered(self, target, lang, candidates):
+        """Returns `candidates` with the last winner for this target/language moved to the front."""
+        candidates = list(candidates)
+        winner = self._entries.get(self._key(target, lang))
+        if winner is None:
+            return candidates
+        first = [c for c in candidates if json.dumps(c) == winner]
+        return first + [c for c in candidates if json.dumps(c) != winner]
+
+    def remember(self, target, lang, candidate):
+        key, value = self._key(target, lang), json.dumps(candidate)
+        with self._lock:
+            if self._entries.get(key) == value:
+                return
+            self._entries[key] = value
+            self._save()
+
+    def forget(self, target, lang):
+        with self._lock:
+            if self._entries.pop(self._key(target, lang), None) is not None:
+                self._save()
+
+LOCATOR_CACHE = LocatorCache()
+
+# ▼▼▼ Fiori Intents (deep links instead of tile search) ▼▼▼
+# App name -> URL hash template with {order_id} / {operation_filter} / {personnel_number} slots,
+# e.g. "SemanticObject-action?Order={order_id}&Operation={operation_filter}".
+# Entries here win over learned ones; everything else is learned from tile navigation.
+FIORI_INTENTS = {}
+
+INTENT_CACHE_PATH = os.environ.get(
+    "SAP_ROBOT_INTENT_CACHE", os.path.join(os.path.expanduser("~"), ".sap_robot_intents.json"))
+
+INTENT_SLOTS = ("order_id", "operation_filter", "personnel_number")
+# Slots a deep link may lack: the personnel number is typed into the app's dialog instead.
+INTENT_DIALOG_SLOTS = ("personnel_number",)
+
+class IntentRegistry(JsonFileStore):
+    """Hash templates for Fiori apps. After a successful tile navigation the landing hash is
+    stored with the order/operation values turned back into slots, so the next open_app
+    for that app is a single driver.get."""
+
+    def __init__(self, path=INTENT_CACHE_PATH, static=None):
+        super().__init__(path)
+        self.static = FIORI_INTENTS if static is None else static
+
+    def template(self, app_name):
+        return self.static.get(app_name) or self._entries.get(app_name)
+
+    def url_for(self, app_name, **values):
+        """Full FLP URL for the app, or None if the intent is unknown, a slot value is missing
+        or a value is given for a slot the template lacks (the link would not filter by it)."""
+        template = self.template(app_name)
+        if not template:
+            return None
+        slots = {field for _, field, _, _ in string.Formatter().parse(template) if field}
+        if any(values.get(s) and s not in slots for s in INTENT_SLOTS if s not in INTENT_DIALOG_SLOTS):
+            return None
+        for slot in [s for s in slots if not values.get(s)]:
+            if slot == "order_id":
+                return None
+            # Optional filter not given: drop its query parameter instead of sending it empty.
+            template = re.sub(r"([?&])[^?&=#]+=\{" + slot + r"\}(&?)",
+                              lambda m: m.group(1) if m.group(2) else "", template)
+            slots.discard(slot)
+        if any("{" + s + "}" in template for s in INTENT_SLOTS if s not in slots):
+            return None  # slot used outside a query parameter, cannot be dropped
+        filled = template.format(**{k: quote(str(values[k]), safe="") for k in slots})
+        return f"{FLP_URL}#{filled.lstrip('#')}"
+
+    def learn(self, app_name, url_hash, **values):
+        """Stores the landing hash as a template. None unless every value given became a slot
+        (a personnel number may be absent from the hash: the app asks for it in a dialog)."""
+        h = (url_hash or "").lstrip("#")
+        if not h or h.startswith("Shell-home") or "-" not in h.split("?")[0]:
+            return None
+        template = h.replace("{", "{{").replace("}", "}}")
+        for slot in INTENT_SLOTS:
+            value = str(values.get(slot) or "")
+            if not value:
+                continue
+            forms = {value, quote(value, safe="")}
+            pattern = "|".join(rf"(?<![0-9A-Za-z]){re.escape(form)}(?![0-9A-Za-z])" for form in forms)
+            if slot in INTENT_DIALOG_SLOTS and not re.search(pattern, template):
+                continue
+            if len(value) < 3:  # too short to tell apart from other numbers in the hash
+                return None
+            template, count = re.subn(pattern, "{" + slot + "}", template)
+            if not count:
+                return None  # landing hash does not carry the value: a deep link would not filter
+        if "{order_id}" not in template:
+            return None  # landing hash is not order-specific: a deep link would not filter
+        with self._lock:
+            if self._entries.get(app_name) != template:
+                self._entries[app_name] = template
+                self._save()
+                print(f"🔗 Learned intent for '{app_name}': #{template}")
+        return template
+
+    def forget(self, app_name):
+        with self._lock:
+            if self._entries.pop(app_name, None) is not None:
+                self._save()
+
+INTENT_REGISTRY = IntentRegistry()
+
+_flp = urlsplit(FLP_URL)
+FLP_ORIGIN = f"{_flp.scheme}://{_flp.netloc}"
+SESSION_STORE_PATH = os.environ.get(
+    "SAP_ROBOT_SESSION_STORE", os.path.join(os.path.expanduser("~"), ".sap_robot_sessions.json"))
+SESSION_MAX_AGE = float(os.environ.get("SAP_ROBOT_SESSION_MAX_AGE", str(12 * 3600)))
+SESSION_CHECK_INTERVAL = float(os.environ.get("SAP_ROBOT_SESSION_CHECK_INTERVAL", "60"))
+# Small authenticated JSON service of the launchpad: 200 + JSON while the session lives,
+# a redirect or the HTML logon page once it has expired.
+SESSION_PROBE_URL = os.environ.get("SAP_ROBOT_SESSION_PROBE", FLP_ORIGIN + "/sap/bc/ui2/start_up")
+# Cookies can only be set for the page's origin: a cheap anonymous page there to land on first.
+SESSION_RESTORE_PATH = "/sap/public/ping"
+
+class SessionStore(JsonFileStore):
+    """Authenticated browser cookies per SAP user, so a restarted robot resumes the SAP
+    session instead of logging in again. Only cookies are written (file mode 0600); the
+    password never leaves process memory."""
+
+    def __init__(self, path=SESSION_STORE_PATH, max_age=SESSION_MAX_AGE):
+        super().__init__(path, file_mode=0o600)
+        self.max_age = max_age
+
+    def save(self, user, cookies):
+        with self._lock:
+            self._entries[user] = {"saved_at": time.time(), "cookies": list(cookies)}
+            self._save()
+
+    def load(self, user):
+        """Cookies saved for `user` that have not expired yet, or [] (too old / none saved)."""
+        with self._lock:
+            entry = self._entries.get(user)
+        if not entry or time.time() - entry.get("saved_at", 0) > self.max_age:
+            return []
+        now = time.time()
+        return [c for c in entry.get("cookies", []) if not c.get("expiry") or c["expiry"] > now]
+
+    def forget(self, user):
+        with self._lock:
+            if self._entries.pop(user, None) is not None:
+                self._save()
+
+SESSION_STORE = SessionStore()
+
+# async: calls back true while the SAP session is alive. The logon form on screen means it is
+# not; otherwise one same-origin request to the probe service decides (no page load).
+SESSION_PROBE_SCRIPT = """
+var url = arguments[0], done = arguments[arguments.length - 1];
+if (document.getElementById('USERNAME_FIELD-inner')) { done(false); return; }
+if (!window.fetch) { done(true); return; }
+fetch(url, {credentials: 'same-origin', redirect: 'manual', headers: {'Accept': 'application/json'}})
+    .then(function (r) {
+        done(r.status === 200 && (r.headers.get('content-type') || '').indexOf('json') >= 0);
+    })
+    .catch(function () { done(false); });
+"""
+
+class PageState:
+    """Where the robot believes its browser is: app, order, operation, personnel number and
+    the URL hash seen when that was recorded. A changed hash means the belief is stale."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.app = None
+        self.order_id = None
+        self.operation = None
+        self.personnel_number = None
+        self.url_hash = None
+        self.updated_at = None
+
+    def update(self, **fields):
+        for name, value in fields.items():
+            setattr(self, name, value)
+        self.updated_at = time.time()
+
+    def is_at(self, app=None, order_id=None, operation=None, personnel_number=None):
+        """True if the recorded state covers the request (unset request fields match anything)."""
+        if self.updated_at is None:
+            return False
+        if app and self.app != app:
+            return False
+        if order_id and self.order_id != order_id:
+            return False
+        if operation and self.operation != operation:
+            return False
+        if personnel_number and str(self.personnel_number or "") != str(personnel_number):
+            return False
+        return True
+
+    def as_dict(self):
+        return {"app": self.app, "order_id": self.order_id, "operation": self.operation,
+                "personnel_number": self.personnel_number, "url_hash": self.url_hash,
+                "updated_at": self.updated_at}
+
+# Spoken/English reason -> German catalogue text (the reason popup is German on DE sessions).
+REASON_EN_DE = {
+    "machine malfunction": "maschinenschaden",
+    "machine failure": "maschinenschaden",
+    "operating error": "bedienungsfehler",
+    "defective material": "materialfehler",
+    "waste": "abfall",
+}
+REASON_CATALOGUE_TTL = float(os.environ.get("SAP_ROBOT_REASON_TTL", str(8 * 3600)))
+
+def _fold(text):
+    t = (text or "").strip().lower()
+    for src, dst in (("ä", "ae"), ("ö", "oe"), ("ü", "ue"), ("ß", "ss")):
+        t = t.replace(src, dst)
+    return re.sub(r"\s+", " ", t)
+
+class ReasonCatalogue:
+    """Deviation reasons ({"key", "text"}) of one browser session in one UI language, read once
+    from the reason control or its value help. Stale after `ttl` seconds, on a language
+    switch, or when setting a key from it was rejected."""
+
+    def __init__(self, ttl=REASON_CATALOGUE_TTL):
+        self.ttl = ttl
+        self.reset()
+
+    def reset(self):
+        self.entries = []
+        self.lang = None
+        self.loaded_at = None
+
+    def load(self, entries, lang):
+        self.entries = [e for e in entries if e.get("key") or e.get("text")]
+        self.lang = lang
+        self.loaded_at = time.time()
+
+    def stale(self, lang):
+        return (self.loaded_at is None or lang != self.lang
+                or time.time() - self.loaded_at > self.ttl)
+
+    def match(self, spoken, cutoff=0.75):
+        """Best entry for a spoken reason: exact key/text, then containment, then a close
+        spelling (difflib ratio >= cutoff). None if nothing is close enough."""
+        wanted = {_fold(spoken)}
+        wanted |= {REASON_EN_DE[w] for w in wanted if w in REASON_EN_DE}
+        wanted |= {en for en, de in REASON_EN_DE.items() if de in wanted}
+        wanted.discard("")
+        if not wanted or not self.entries:
+            return None
+        names = {}
+        for entry in self.entries:
+            for name in (_fold(entry.get("key")), _fold(entry.get("text"))):
+                if name:
+                    names.setdefault(name, entry)
+        for w in wanted:
+            if w in names:
+                return names[w]
+        for w in sorted(wanted, key=len, reverse=True):
+            for name, entry in names.items():
+                if len(w) >= 4 and (w in name or name in w):
+                    return entry
+        for w in wanted:
+            close = difflib.get_close_matches(w, list(names), n=1, cutoff=cutoff)
+            if close:
+                return names[close[0]]
+        return None
+
+    def as_dict(self):
+        return {"lang": self.lang, "loaded_at": self.loaded_at, "entries": len(self.entries)}
+
+# Row properties of the order worklist table model (first present wins).
+WORKLIST_ORDER_FIELDS = ("ManufacturingOrder", "ProductionOrder", "OrderID", "Order", "OrderNumber", "Aufnr")
+WORKLIST_OPERATION_FIELDS = ("ManufacturingOrderOperation", "OperationActivity", "Operation", "OperationID", "Vornr")
+WORKLIST_TTL = float(os.environ.get("SAP_ROBOT_WORKLIST_TTL", "300"))
+
+class Worklist:
+    """Snapshot of one operator's order/operation worklist, read in bulk from the table model and
+    indexed by order, (order, operation) and position. A refresh with the same rows in the same
+    order only updates row data in place; the indexes are rebuilt when rows come or go."""
+
+    def __init__(self, ttl=WORKLIST_TTL):
+        self.ttl = ttl
+        self.reset()
+
+    def reset(self):
+        self.rows = []
+        self.personnel_number = None
+        self.table_id = None
+        self.refreshed_at = None
+        self._by_order = {}   # order id -> [positions]
+        self._by_key = {}     # (order id, operation) -> position
+
+    def stale(self, personnel_number=None):
+        if self.refreshed_at is None or time.time() - self.refreshed_at > self.ttl:
+            return True
+        return bool(personnel_number) and personnel_number != self.personnel_number
+
+    def refresh(self, rows, personnel_number=None, table_id=None):
+        """Applies a fresh read; returns {"added", "removed", "changed"} row counts."""
+        keys = [(r["order_id"], r.get("operation") or "") for r in rows]
+        old = {(r["order_id"], r["operation"]): r for r in self.rows}
+        same_shape = personnel_number == self.personnel_number and keys == [k for k in old]
+        changed = 0
+        if same_shape:
+            for row, key in zip(rows, keys):
+                if any(old[key].get(k) != v for k, v in row.items()):
+                    old[key].update(row)
+                    changed += 1
+            delta = {"added": 0, "removed": 0, "changed": changed}
+        else:
+            self.rows = [dict(r, operation=key[1], position=i) for i, (r, key) in enumerate(zip(rows, keys))]
+            self._by_order, self._by_key = {}, {}
+            for row in self.rows:
+                self._by_order.setdefault(row["order_id"], []).append(row["position"])
+                self._by_key[(row["order_id"], row["operation"])] = row["position"]
+            delta = {"added": len(set(keys) - set(old)), "removed": len(set(old) - set(keys)), "changed": 0}
+        self.personnel_number = personnel_number
+        self.table_id = table_id
+        self.refreshed_at = time.time()
+        return delta
+
+    def position(self, order_id, operation=None):
+        if operation:
+            return self._by_key.get((order_id, operation))
+        positions = self._by_order.get(order_id)
+        return positions[0] if positions else None
+
+    def find(self, order_id, operation=None):
+        pos = self.position(order_id, operation)
+        return self.rows[pos] if pos is not None else None
+
+    def neighbour(self, order_id, operation=None, step=1):
+        """Row `step` positions away from the given one (None at either end or if unknown)."""
+        pos = self.position(order_id, operation)
+        if pos is None or not 0 <= pos + step < len(self.rows):
+            return None
+        return self.rows[pos + step]
+
+    def as_dict(self):
+        return {"rows": len(self.rows), "personnel_number": self.personnel_number,
+                "refreshed_at": self.refreshed_at}
+
+# Returns true when the page is idle: document loaded, and for UI5 pages no pending
+# jQuery requests, no re-rendering and no visible busy indicator. Only public signals: the
+# page's own code is never instrumented.
+UI5_IDLE_SCRIPT = """
+var w = window, d = document;
+if (d.readyState === 'loading') return false;
+if (!(w.sap && w.sap.ui && w.sap.ui.getCore)) return d.readyState === 'complete';
+var core = w.sap.ui.getCore();
+if (core.getUIDirty && core.getUIDirty()) return false;
+if (w.jQuery && w.jQuery.active > 0) return false;
+var busy = d.querySelectorAll('.sapUiLocalBusyIndicator, .sapUiBusyIndicator, .sapMBusyDialog');
+for (var i = 0; i < busy.length; i++) {
+    if (busy[i].getClientRects().length) return false;
+}
+return true;
+"""
+
+# Resolves an ordered list of [by, locator] candidates ("xpath" or "css selector") inside the
+# page and clicks the first visible, enabled match, polling until the timeout; one async
+# script call instead of find/is_displayed/click round-trips per candidate. Calls back with
+# {index, text} of the winner or null.
+CLICK_HIGHLIGHT = os.environ.get("SAP_ROBOT_HIGHLIGHT", "") == "1"
+CLICK_FIRST_SCRIPT = """
+var candidates = arguments[0], highlight = arguments[1], deadline = Date.now() + arguments[2];
+var done = arguments[arguments.length - 1];
+function nodes(c) {
+    if (c[0] === "xpath") {
+        var r = document.evaluate(c[1], document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null), out = [];
+        for (var i = 0; i < r.snapshotLength; i++) out.push(r.snapshotItem(i));
+        return out;
+    }
+    return Array.prototype.slice.call(document.querySelectorAll(c[1]));
+}
+function usable(node) {
+    var el = node.closest ? (node.closest("button, a, [role='button']") || node) : null;
+    if (!el || !el.getClientRects().length) return null;
+    var style = window.getComputedStyle(el);
+    if (style.visibility === "hidden" || style.pointerEvents === "none") return null;
+    if (el.disabled || el.getAttribute("aria-disabled") === "true") return null;
+    return el;
+}
+function attempt() {
+    for (var i = 0; i < candidates.length; i++) {
+        var found;
+        try { found = nodes(candidates[i]); } catch (e) { continue; }
+        for (var j = 0; j < found.length; j++) {
+            var el = usable(found[j]);
+            if (!el) continue;
+            el.scrollIntoView({block: "center"});
+            if (highlight) el.style.outline = "3px solid red";
+            ["mousedown", "mouseup"].forEach(function (type) {
+                el.dispatchEvent(new MouseEvent(type, {bubbles: true, cancelable: true, view: window}));
+            });
+            el.click();
+            return done({index: i, text: (el.innerText || el.title || "").trim().slice(0, 80)});
+        }
+    }
+    if (Date.now() >= deadline) return done(null);
+    setTimeout(attempt, 100);
+}
+attempt();
+"""
+
+# Quantity fields of the confirmation form: last segment of the value binding path
+# (app model or API_PROD_ORDER_CONFIRMATION_2 names), matched case-insensitively.
+QTY_FIELD_BINDINGS = {
+    "yield": ("Yield", "YieldQuantity", "ConfirmationYieldQuantity"),
+    "scrap": ("Scrap", "ScrapQuantity", "ConfirmationScrapQuantity"),
+    "rework": ("Rework", "ReworkQuantity", "ConfirmationReworkQuantity"),
+}
+REASON_FIELD_BINDINGS = ("Reason", "VarianceReason", "ConfirmationReason", "DeviationReason")
+QTY_FILL_MODE = os.environ.get("SAP_ROBOT_QTY_FILL", "ui5")   # "ui5" or "keys"
+
+# Shared prelude: resolve(f) finds a visible, editable UI5 input control by the last segment of
+# its value binding path (f.paths), else by the text of a label pointing at it (f.labels).
+UI5_RESOLVE_JS = """
+if (!window.sap || !sap.ui || !sap.ui.getCore) return null;
+var core = sap.ui.getCore();
+function norm(s) { return String(s || "").replace(/[:*\\s]+$/, "").trim().toLowerCase(); }
+function fillable(c) {
+    var d = c && c.setValue && c.getValue && c.fireChange && c.getDomRef && c.getDomRef();
+    return !!(d && d.getClientRects().length && (!c.getEditable || c.getEditable()));
+}
+var registry = sap.ui.core.Element && sap.ui.core.Element.registry;
+var inputs = registry ? registry.filter(fillable) :
+    Array.prototype.map.call(document.querySelectorAll(".sapMInputBase"), function (d) {
+        return core.byId(d.id);
+    }).filter(fillable);
+function labelTexts(c) {
+    var ids = sap.ui.core.LabelEnablement ? sap.ui.core.LabelEnablement.getReferencingLabels(c) || [] : [];
+    if (c.getAriaLabelledBy) ids = ids.concat(c.getAriaLabelledBy());
+    return ids.map(function (id) {
+        var label = core.byId(id), dom = document.getElementById(id);
+        return norm(label && label.getText ? label.getText() : dom && dom.textContent);
+    });
+}
+function resolve(f) {
+    var paths = f.paths.map(norm), labels = f.labels.map(norm);
+    for (var i = 0; i < inputs.length; i++) {
+        var path = inputs[i].getBindingPath && inputs[i].getBindingPath("value");
+        if (path && paths.indexOf(norm(path.split("/").pop())) !== -1) return [inputs[i], "binding"];
+    }
+    for (var j = 0; j < inputs.length; j++) {
+        if (labelTexts(inputs[j]).some(function (t) { return labels.indexOf(t) !== -1; })) return [inputs[j], "label"];
+    }
+    return null;
+}
+"""
+
+# Resolves every field, then sets the values (and selectedKey where given) and fires change in
+# the same call. All-or-nothing: returns {missing: [keys]} without touching the form if any
+# field is not resolved, null if UI5 is not loaded.
+UI5_FILL_SCRIPT = "var fields = arguments[0];" + UI5_RESOLVE_JS + """
+var resolved = fields.map(resolve), missing = [];
+fields.forEach(function (f, i) { if (!resolved[i]) missing.push(f.key); });
+if (missing.length) return {missing: missing};
+var controls = {};
+fields.forEach(function (f, i) {
+    var c = resolved[i][0];
+    c.setValue(f.value);
+    if (f.selectedKey && c.setSelectedKey) c.setSelectedKey(f.selectedKey);
+    c.fireChange({value: f.value});
+    controls[f.key] = {id: c.getId(), via: resolved[i][1]};
+});
+return {controls: controls};
+"""
+
+# Reason catalogue straight from the reason control (ComboBox/Select items or Input suggestion
+# items): {id, items: [{key, text}]}; items is empty when only a value-help dialog has them.
+UI5_REASON_ITEMS_SCRIPT = "var field = arguments[0];" + UI5_RESOLVE_JS + """
+var r = resolve(field);
+if (!r) return null;
+var c = r[0], src = (c.getItems && c.getItems()) || [];
+if (!src.length && c.getSuggestionItems) src = c.getSuggestionItems();
+return {id: c.getId(), items: src.map(function (i) {
+    return {key: i.getKey ? i.getKey() : "", text: i.getText ? i.getText() : ""};
+})};
+"""
+
+# Rows of the open value-help dialog: list items as {key: description || title, text: title},
+# table rows as {key: first cell, text: second cell}.
+UI5_DIALOG_ITEMS_SCRIPT = """
+if (!window.sap || !sap.m || !sap.m.InstanceManager) return [];
+var out = [];
+function cellText(c) { return c && c.getText ? c.getText() : c && c.getTitle ? c.getTitle() : ""; }
+sap.m.InstanceManager.getOpenDialogs().forEach(function (dialog) {
+    var items = dialog.getItems ? dialog.getItems() : [];
+    items.forEach(function (item) {
+        if (item.getCells) {
+            var cells = item.getCells();
+            out.push({key: cellText(cells[0]), text: cellText(cells[1]) || cellText(cells[0])});
+        } else if (item.getTitle) {
+            out.push({key: (item.getDescription && item.getDescription()) || item.getTitle(), text: item.getTitle()});
+        }
+    });
+});
+return out;
+"""
+
+# Reads back value and value state of UI5 controls: {key: {value, state}} for {key: id}.
+UI5_READ_SCRIPT = """
+var ids = arguments[0], core = sap.ui.getCore(), out = {};
+Object.keys(ids).forEach(function (key) {
+    var c = core.byId(ids[key]);
+    out[key] = c ? {value: c.getValue(), state: c.getValueState ? c.getValueState() : "None"} : null;
+});
+return out;
+"""
+
+# Bulk read of the visible worklist table (sap.m.Table or sap.ui.table.Table) from its binding:
+# {table, total, rows: [{order_id, operation}]}; rows without an order field are skipped.
+# A binding with filters applied (a filter-bar search) only reports {filtered: true}.
+UI5_WORKLIST_SCRIPT = """
+var orderFields = arguments[0], opFields = arguments[1];
+if (!window.sap || !sap.ui || !sap.ui.getCore) return null;
+var registry = sap.ui.core.Element && sap.ui.core.Element.registry;
+if (!registry) return null;
+function pick(obj, names) {
+    for (var i = 0; i < names.length; i++) {
+        if (obj && obj[names[i]] !== undefined && obj[names[i]] !== null && obj[names[i]] !== "") return String(obj[names[i]]);
+    }
+    return "";
+}
+var tables = registry.filter(function (c) {
+    var d = c.getDomRef && c.getDomRef();
+    return d && d.getClientRects().length && c.isA && (c.isA("sap.m.Table") || c.isA("sap.ui.table.Table"));
+});
+for (var t = 0; t < tables.length; t++) {
+    var binding = tables[t].getBinding("items") || tables[t].getBinding("rows");
+    if (!binding) continue;
+    var filters = (binding.aApplicationFilters || []).length + (binding.aFilters || []).length;
+    if (filters) return {table: tables[t].getId(), total: 0, rows: [], filtered: true};
+    var total = binding.getLength ? binding.getLength() : 0;
+    var rows = binding.getContexts(0, Math.max(total, 1)).map(function (ctx) {
+        var obj = ctx && ctx.getObject();
+        return {order_id: pick(obj, orderFields), operation: pick(obj, opFields)};
+    }).filter(function (r) { return r.order_id; });
+    if (rows.length) return {table: tables[t].getId(), total: total, rows: rows};
+}
+return {table: null, total: 0, rows: []};
+"""
+
+# Opens one worklist row by its model data instead of a DOM text search: clicks the rendered
+# list item (sap.m.Table), or scrolls the row into view and clicks it (sap.ui.table.Table).
+# Calls back with true/false.
+UI5_WORKLIST_OPEN_SCRIPT = """
+var tableId = arguments[0], orderId = arguments[1], operation = arguments[2];
+var orderFields = arguments[3], opFields = arguments[4], done = arguments[arguments.length - 1];
+var table = window.sap && sap.ui.getCore().byId(tableId);
+if (!table) return done(false);
+function matches(ctx) {
+    var obj = ctx && ctx.getObject();
+    if (!obj) return false;
+    var order = orderFields.some(function (f) { return String(obj[f]) === orderId; });
+    return order && (!operation || opFields.some(function (f) { return String(obj[f]) === operation; }));
+}
+function click(dom) {
+    if (!dom) return done(false);
+    dom.scrollIntoView({block: "center"});
+    dom.click();
+    done(true);
+}
+if (table.getItems) {
+    var item = table.getItems().filter(function (i) { return matches(i.getBindingContext()); })[0];
+    return click(item && item.getDomRef());
+}
+var binding = table.getBinding("rows"), contexts = binding.getContexts(0, binding.getLength()), index = -1;
+for (var i = 0; i < contexts.length; i++) { if (matches(contexts[i])) { index = i; break; } }
+if (index < 0) return done(false);
+table.setFirstVisibleRow(index);
+setTimeout(function () {
+    var row = table.getRows().filter(function (r) { return r.getIndex() === index; })[0];
+    click(row && row.getDomRef());
+}, 150);
+"""
+
+# A lone separator followed by exactly three digits ("1.000", "12,500"): grouping or decimal,
+# depending on the UI language.
+_GROUPED_QUANTITY = re.compile(r"-?\d{1,3}([.,])\d{3}(\1\d{3})*")
+_THOUSANDS_SEPARATORS = {"de": ".", "en": ","}
+
+def parse_quantity(text, lang=None):
+    """Float from a quantity as typed or as UI5 formats it ("5", "3,5", "1.000,500", "1,000.5").
+    `lang` is the UI language the value was formatted in: with "de", "1.000" is 1000."""
+    t = str(text or "").strip().replace(" ", "").replace("\u00a0", "")
+    grouped = _GROUPED_QUANTITY.fullmatch(t)
+    if grouped and grouped.group(1) == _THOUSANDS_SEPARATORS.get(lang):
+        t = t.replace(grouped.group(1), "")
+    elif "," in t and "." in t:
+        decimal = "," if t.rfind(",") > t.rfind(".") else "."
+        t = t.replace("." if decimal == "," else ",", "").replace(decimal, ".")
+    else:
+        t = t.replace(",", ".")
+    try:
+        return float(t)
+    except ValueError:
+        return None
+
+class SapRobot:
+    def __init__(self, shared=True, mode=None):
+        """shared=True reuses/publishes the module-level SHARED_DRIVER;
+        pooled robots pass shared=False and own their browser."""
+        global SHARED_DRIVER
+        self.shared = shared
+        self.mode = mode or DRIVER_MODE
+        self.cold_start_s = None
+        self.ui_language = None
+        self.page_state = PageState()
+        self.reasons = ReasonCatalogue()
+        self.worklist = Worklist()
+        self.driver = None
+        self.wait = None
+        self.long_wait = None
+        self._credentials = None        # (username, password) of the last login, memory only
+        self._session_checked_at = 0.0
+
+        if not shared:
+            return
+
+        if SHARED_DRIVER is not None:
+            if self._driver_alive(SHARED_DRIVER):
+                print("♻️ Reconnected to existing browser session!")
+                self.driver = SHARED_DRIVER
+                self._init_waits()
+            else:
+                print("⚠️ Old browser connection lost. Will start new one.")
+                SHARED_DRIVER = None
+        else:
+            print("🤖 Robot initialized (No active browser found).")
+
+    @staticmethod
+    def _driver_alive(driver):
+        # One round-trip into the page: fails if Chrome or the chromedriver session is gone.
+        try:
+            return driver.execute_script("return document.readyState") is not None
+        except Exception:
+            return False
+
+    def is_alive(self):
+        return self.driver is not None and self._driver_alive(self.driver)
+
+    def _detect_language(self):
+        """Reads the Fiori UI language once per session. Stays None until UI5 answers;
+        languages other than EN/DE are recorded as 'unknown' (both-language locators)."""
+        try:
+            lang = (self.driver.execute_script(UI_LANGUAGE_SCRIPT) or "")[:2].lower()
+        except WebDriverException:
+            lang = ""
+        if lang:
+            self.ui_language = lang if lang in UI_LANGUAGES else "unknown"
+            print(f"🌐 UI language: {self.ui_language}")
+        return self.ui_language
+
+    def _ui_language(self):
+        if self.ui_language is None and self.driver is not None:
+            self._detect_language()
+        return self.ui_language or "unknown"
+
+    def _t(self, key, default=None):
+        return ui_texts(key, self._ui_language(), default)
+
+    def _ordered(self, target, candidates):
+        return LOCATOR_CACHE.ordered(target, self._ui_language(), candidates)
+
+    def _remember(self, target, candidate):
+        LOCATOR_CACHE.remember(target, self._ui_language(), candidate)
+
+    def _forget(self, target):
+        LOCATOR_CACHE.forget(target, self._ui_language())
+
+    def _wait_ui_idle(self, timeout=10, poll=0.1, stable_polls=2):
+        """Polls UI5_IDLE_SCRIPT (one execute_script per poll) until Fiori reports idle on
+        `stable_polls` consecutive polls. Returns False on timeout; callers carry on as they
+        did after the old fixed sleeps and let the next explicit wait fail if needed."""
+        if self.driver is None:
+            return False
+        deadline = time.time() + timeout
+        stable = 0
+        while True:
+            try:
+                idle = bool(self.driver.execute_script(UI5_IDLE_SCRIPT))
+            except WebDriverException:
+                idle = False
+            stable = stable + 1 if idle else 0
+            if stable >= stable_polls:
+                return True
+            if time.time() >= deadline:
+                print(f"⚠️ UI not idle after {timeout}s, continuing...")
+                return False
+            time.sleep(poll)
+
+    def _init_waits(self):
+        if self.driver:
+            self.wait = WebDriverWait(self.driver, 10)
+            self.long_wait = WebDriverWait(self.driver, 20)
+
+    def _start_driver_if_not_running(self):
+        global SHARED_DRIVER
+        if self.driver is not None:
+            return
+
+        print(f"Starting a new browser instance ({self.mode} mode)...")
+        t0 = time.perf_counter()
+        driver_path = resolve_driver_path()
+        t_resolve = time.perf_counter() - t0
+        chrome_options = build_chrome_options(self.mode)
+
+        try:
+            self.driver = webdriver.Chrome(service=Service(driver_path), options=chrome_options)
+        except WebDriverException as e:
+            # A cached driver can go stale after a Chrome update: resolve again once.
+            print(f"⚠️ Cached chromedriver failed ({e.__class__.__name__}), resolving again...")
+            driver_path = resolve_driver_path(refresh=True)
+            self.driver = webdriver.Chrome(service=Service(driver_path), options=chrome_options)
+        self._init_waits()
+        self.ui_language = None
+        self.page_state.reset()
+        self.reasons.reset()
+        self.worklist.reset()
+        self._session_checked_at = 0.0
+        self._restore_session()
+
+        self.cold_start_s = time.perf_counter() - t0
+        print(f"⏱️ Cold start {self.cold_start_s:.2f}s (driver resolve {t_resolve:.2f}s, "
+              f"launch {self.cold_start_s - t_resolve:.2f}s)")
+
+        if self.shared:
+            SHARED_DRIVER = self.driver
+            print("Browser started and saved to global session.")
+        else:
+            print("Browser started (pooled session).")
+
+    def login(self, username, password):
+        try:
+            self._start_driver_if_not_running()
+            if self._session_user() != username:
+                # Cookies restored for another user must not carry over; this user's may.
+                self.driver.delete_all_cookies()
+                self._restore_session(username)
+            login_url = FLP_URL
+            self.driver.get(login_url)
+
+            first = self.wait.until(EC.any_of(
+                EC.presence_of_element_located((By.ID, 'USERNAME_FIELD-inner')),
+                EC.presence_of_element_located((By.ID, 'shell-header-logo')),
+            ))
+            restored = first.get_attribute("id") == 'shell-header-logo'
+            if not restored:
+                user_field = first
+                pass_field = self.driver.find_element(By.ID, 'PASSWORD_FIELD-inner')
+
+                user_field.send_keys(username)
+                pass_field.send_keys(password)
+                self.driver.find_element(By.ID, 'LOGIN_LINK').click()
+
+                self.long_wait.until(EC.presence_of_element_located((By.ID, 'shell-header-logo')))
+            print(f"Successfully logged in as {username}{' (restored session)' if restored else ''}.")
+            self._credentials = (username, password)
+            self._session_checked_at = time.time()
+            self.ui_language = None
+            self.page_state.reset()
+            self.reasons.reset()
+            self.worklist.reset()
+            self._save_session()
+            self._detect_language()
+            return {"status": "success",
+                    "message": "Login successful (session restored)" if restored else "Login successful"}
+
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
+    # ▼▼▼ Session persistence / transparent re-login ▼▼▼
+    def _session_user(self):
+        return self._credentials[0] if self._credentials else (SAP_USERNAME or "default")
+
+    def _restore_session(self, user=None):
+        """Puts the cookies saved for this user into a freshly started browser. They can only be
+        set on a page of the SAP origin, so one anonymous page there is loaded first."""
+        user = user or self._session_user()
+        cookies = SESSION_STORE.load(user)
+        if not cookies:
+            return False
+        try:
+            self.driver.get(FLP_ORIGIN + SESSION_RESTORE_PATH)
+            restored = 0
+            for cookie in cookies:
+                cookie = {k: v for k, v in cookie.items()
+                          if k in ("name", "value", "path", "domain", "secure", "httpOnly", "expiry", "sameSite")}
+                try:
+                    self.driver.add_cookie(cookie)
+                    restored += 1
+                except WebDriverException:
+                    pass
+        except WebDriverException as e:
+            print(f"⚠️ Could not restore SAP session: {e.__class__.__name__}")
+            return False
+        print(f"🍪 Restored {restored} session cookie(s) for {user}")
+        return restored > 0
+
+    def _save_session(self):
+        if self.driver is None:
+            return
+        try:
+            SESSION_STORE.save(self._session_user(), self.driver.get_cookies())
+        except WebDriverException as e:
+            print(f"⚠️ Could not save SAP session: {e.__class__.__name__}")
+
+    def _session_alive(self):
+        try:
+            if not (self.driver.current_url or "").startswith(FLP_ORIGIN):
+                self.driver.get(FLP_URL)
+            return bool(self.driver.execute_async_script(SESSION_PROBE_SCRIPT, SESSION_PROBE_URL))
+        except WebDriverException:
+            return False
+
+    def ensure_session(self, force=False):
+        """Checks (at most every SESSION_CHECK_INTERVAL seconds) that the SAP session is still
+        alive and logs in again with the last or configured credentials when it is not.
+        Returns None when the session is usable, else the error result to report."""
+        self._start_driver_if_not_running()
+        now = time.time()
+        if not force and now - self._session_checked_at < SESSION_CHECK_INTERVAL:
+            return None
+        if self._session_alive():
+            self._session_checked_at = now
+            return None
+
+        credentials = self._credentials or (
+            (SAP_USERNAME, SAP_PASSWORD) if SAP_USERNAME and SAP_PASSWORD else None)
+        if not credentials:
+            return {"status": "error",
+                    "message": "SAP session expired and no credentials are stored; send a login command"}
+        print(f"🔑 SAP session expired, logging in again as {credentials[0]}...")
+        SESSION_STORE.forget(credentials[0])
+        self.driver.delete_all_cookies()
+        result = self.login(*credentials)
+        return None if result.get("status") == "success" else result
+
+    # ▼▼▼ Core Navigation (Bilingual + App Translation) ▼▼▼
+    def open_app(self, personnel_number, operation_filter, order_id, app_name):
+        print(f"Executing workflow: open_app for '{app_name}' (Filter Op: {operation_filter})...")
+        try:
+            self._start_driver_if_not_running()
+            search_xpath = f"//input[{xp_any('@placeholder', self._t('search'))}]"
+
+            # --- Already there (page state + URL hash, no DOM scan) ---
+            if order_id and self._is_at(app_name, order_id, operation_filter, personnel_number):
+                print(f"✅ Already on '{app_name}' for order {order_id}.")
+                return {"status": "success", "message": f"Opened: {app_name} (already open)"}
+
+            # --- Phase 0: Deep link (known Fiori intent, one page load) ---
+            if self._open_via_intent(app_name, personnel_number, order_id, operation_filter):
+                self._record_position(app_name, personnel_number, order_id, operation_filter)
+                return {"status": "success", "message": f"Opened: {app_name} (deep link)"}
+
+            # --- Phase 1: Smart Navigation (Search/Suchen) ---
+            try:
+                quick_check = WebDriverWait(self.driver, 3)
+                quick_check.until(EC.presence_of_element_located(
+                    (By.XPATH, search_xpath)
+                ))
+                print("✅ Already inside app (Search/Suchen visible).")
+            except:
+                on_personnel_screen = False
+                try:
+                    WebDriverWait(self.driver, 2).until(EC.presence_of_element_located(
+                        (By.XPATH, "//input[contains(@id, 'inputPerNr')]")
+                    ))
+                    on_personnel_screen = True
+                except: pass
+
+                if not on_personnel_screen:
+                    print("Step 0: Go to home...")
+                    home_url = f"{FLP_URL}#Shell-home"
+                    if "Shell-home" not in self.driver.current_url: self.driver.get(home_url)
+                    self._wait_ui_idle(timeout=15)
+                    print("Step 1: Click tile...")
+                    try: self.long_wait.until(EC.element_to_be_clickable((By.ID, "__tile1-title-inner"))).click()
+                    except:
+                        titles = ", ".join(f"[title='{t}']" for t in self._t("app:Advanced Manufacturing"))
+                        self.driver.find_element(By.CSS_SELECTOR, titles).click()
+                    self._wait_ui_idle(timeout=20)
+
+            # --- Phase 2: Personnel Number ---
+            print("Step 2: Check personnel input...")
+            try:
+                if not self._submit_personnel_number(personnel_number):
+                    raise TimeoutException("no personnel dialog")
+                WebDriverWait(self.driver, 15).until(EC.presence_of_element_located(
+                    (By.XPATH, search_xpath)
+                ))
+            except: print("No personnel input needed, continuing...")
+
+            # --- Phase 2.5: Worklist snapshot (open the row from the table model) ---
+            if self._open_from_worklist(personnel_number, order_id, operation_filter):
+                print(f"⚡️ Opened order {order_id} from worklist snapshot.")
+            else:
+                # --- Phase 3: Filters (EN: Operation / DE: Vorgang) ---
+                print("Step 3: Handle filters (Operation/Vorgang Check)...")
+                operation_field_visible = False
+                op_texts = self._t("operation")
+
+                try:
+                    self.driver.find_element(By.XPATH, "//input[" + " or ".join(
+                        f"contains(@aria-label, '{t}') or contains(@placeholder, '{t}')" for t in op_texts) + "]")
+                    operation_field_visible = True
+                except:
+                    try:
+                        self.driver.find_element(By.XPATH, f"//*[{xp_any('text()', op_texts)}]/following::input[1]")
+                        operation_field_visible = True
+                    except: pass
+
+                if not operation_field_visible:
+                    print("❌ 'Operation/Vorgang' filter not found -> Adapt Filters...")
+                    self.driver.find_element(By.XPATH, f"//*[{xp_any('text()', self._t('adapt_filters'), op='contains')}]").click()
+                    self._wait_ui_idle()
+
+                    search_box = self.wait.until(EC.element_to_be_clickable((
+                        By.XPATH, f"//input[@type='search' or {xp_any('@placeholder', self._t('filter_search'))}]"
+                    )))
+                    search_box.clear()
+
+                    lang = self._ui_language()
+                    if lang == "unknown":
+                        page = self.driver.page_source
+                        lang = "de" if "Suchen" in page or "Filter anpassen" in page else "en"
+                    search_term = ui_texts("operation", lang)[0]
+                
+                    print(f"Searching for filter: {search_term}")
+                    search_box.send_keys(search_term) 
+                    self._wait_ui_idle()
+
+                    print(f"Selecting '{search_term}' checkbox...")
+                    try:
+                        target_row_xpath = f"//tr[.//text()[normalize-space()='{search_term}']][.//div[@role='checkbox']]"
+                        checkbox = self.driver.find_element(By.XPATH, target_row_xpath + "//div[@role='checkbox']")
+                        checkbox.click()
+                        print(f"✅ Clicked '{search_term}' checkbox")
+                    except:
+                        print("⚠️ Precise selection failed, trying loop method...")
+                        try:
+                            rows = self.driver.find_elements(By.XPATH, "//tr[.//div[@role='checkbox']]")
+                            for row in rows:
+                                if row.text.strip() == search_term:
+                                    row.find_element(By.XPATH, ".//div[@role='checkbox']").click()
+                                    break
+                        except: pass
+
+                    self.driver.find_element(By.XPATH, f"//*[{xp_any('text()', self._t('ok'))}]").click()
+                    self._wait_ui_idle()
+                else:
+                    print("✅ 'Operation/Vorgang' filter present, skip Adapt.")
+
+                # --- Phase 3.3: Tab Input Strategy ---
+                print("Step 3.3: Keyboard navigation input...")
+            
+                search_input = self.wait.until(EC.element_to_be_clickable(
+                    (By.XPATH, search_xpath)
+                ))
+                search_input.click()
+                search_input.send_keys(Keys.CONTROL, "a")
+                search_input.send_keys(Keys.DELETE)
+
+                actions = ActionChains(self.driver)
+            
+                # Tab to Order / Auftrag
+                print(f"👉 Tab to Order/Auftrag, input: {order_id}")
+                actions.send_keys(Keys.TAB).perform()
+                self.driver.switch_to.active_element.send_keys(order_id)
+            
+                # Tab to Operation / Vorgang
+                if operation_filter:
+                    print(f"👉 Tab to Operation/Vorgang, input: {operation_filter}")
+                    actions.send_keys(Keys.TAB).perform()
+                    self.driver.switch_to.active_element.send_keys(operation_filter)
+
+                print("Step 4: Click Go/Start...")
+                go_texts = self._t("go")
+                for label in go_texts:
+                    try:
+                        self.driver.find_element(By.XPATH, f"//button[.='{label}']").click()
+                        break
+                    except: pass
+                else:
+                    self.driver.find_element(By.XPATH, f"//*[{xp_any('text()', go_texts)}]").click()
+                self._wait_ui_idle(timeout=15)
+                # The table now shows this order only: the snapshot must not be taken from it.
+                self.worklist.refreshed_at = None
+
+                # 5. Click Order Row
+                print(f"Step 5: Click Order {order_id}...")
+                row = self.long_wait.until(EC.element_to_be_clickable(
+                    (By.XPATH, f"//*[text()='{order_id}']/ancestor::tr[1]")
+                ))
+                row.click()
+                self._wait_ui_idle(timeout=15)
+
+            # --- 6. Open Final App (🟢 修复点：自动翻译 App 名字) ---
+            print(f"Step 6: Open App '{app_name}'...")
+            
+            # App 名字来自中央翻译表 (UI 语言); 如果没有就用原名
+            tile_names = self._t(f"app:{app_name}", default=[app_name])
+            print(f"   -> Looking for: {tile_names}")
+
+            # Tile 的 Title 或 Text 包含其中一个名字即可
+            xpath_locator = f"//*[{xp_any('@title', tile_names)} or {xp_any('text()', tile_names, op='contains')}]"
+
+            # CSS title -> XPath 模糊匹配 -> 只搜前几个词; last winner first (locator cache)
+            short_name = app_name.split(' ')[0]
+            tile_candidates = self._ordered(f"app tile:{app_name}", [
+                (By.CSS_SELECTOR, ", ".join(f"[title='{n}']" for n in tile_names)),
+                (By.XPATH, xpath_locator),
+                (By.XPATH, f"//*[contains(text(), '{short_name}')]"),
+            ])
+            last_error = None
+            for i, candidate in enumerate(tile_candidates):
+                try:
+                    if i == 0:
+                        self.long_wait.until(EC.element_to_be_clickable(candidate)).click()
+                    else:
+                        self.driver.find_element(*candidate).click()
+                    self._remember(f"app tile:{app_name}", candidate)
+                    break
+                except Exception as e:
+                    last_error = e
+                    print(f"❌ App tile not clickable via {candidate[1]}: {e.__class__.__name__}")
+            else:
+                self._forget(f"app tile:{app_name}")
+                raise last_error
+
+            print(f"Clicked '{app_name}' Tile!")
+            self._learn_intent(app_name, personnel_number, order_id, operation_filter)
+            self._record_position(app_name, personnel_number, order_id, operation_filter)
+            return {"status": "success", "message": f"Opened: {app_name}"}
+
+        except Exception as e:
+            print(f"!! Workflow failed: {e}")
+            self.page_state.reset()
+            return {"status": "error", "message": str(e)}
+
+    
+
+    # ▼▼▼ Qty Confirmation (Bilingual: EN/DE) ▼▼▼
+    def qty_confirmation(self, personnel_number="1", operation_filter="", order_id=None,
+                         yield_qty="0", scrap_qty="0", rework_qty="0", reason=""):
+        """Books quantities (Yield/Scrap/Rework) and optional reason via value help.
+        Designed to not affect other use cases (called only when action == 'qty_confirmation')."""
+        print(f"Executing workflow: qty_confirmation | Order={order_id} Op={operation_filter} "
+              f"Yield={yield_qty} Scrap={scrap_qty} Rework={rework_qty} Reason={reason}")
+
+        try:
+            self._start_driver_if_not_running()
+
+            # ---------- helpers ----------
+            def _scroll_into_view(el):
+                try:
+                    self.driver.execute_script("arguments[0].scrollIntoView({block:'center'});", el)
+                except:
+                    pass
+
+            def _safe_click(el):
+                try:
+                    _scroll_into_view(el)
+                    el.click()
+                    return True
+                except:
+                    try:
+                        self.driver.execute_script("arguments[0].click();", el)
+                        return True
+                    except:
+                        return False
+
+            def press_esc(times=2):
+                try:
+                    for _ in range(times):
+                        ActionChains(self.driver).send_keys(Keys.ESCAPE).perform()
+                        self._wait_ui_idle(timeout=2)
+                except:
+                    pass
+
+            def close_any_popups():
+                press_esc(2)
+                close_texts = self._t("close")
+                close_xpaths = [
+                    f"//button[{xp_any('@title', close_texts)}]",
+                    f"//span[{xp_any('@title', close_texts)}]/ancestor::button[1]",
+                    f"//button[{xp_any('@aria-label', close_texts, op='contains')}]",
+                ]
+                for xp in close_xpaths:
+                    try:
+                        for b in self.driver.find_elements(By.XPATH, xp):
+                            if b.is_displayed() and b.is_enabled():
+                                _safe_click(b)
+                                self._wait_ui_idle(timeout=2)
+                    except:
+                        pass
+
+            def click_bilingual_button(texts):
+                for t in texts:
+                    try:
+                        btn = WebDriverWait(self.driver, 6).until(
+                            EC.element_to_be_clickable((By.XPATH, f"//button[normalize-space()='{t}']"))
+                        )
+                        return _safe_click(btn)
+                    except:
+                        pass
+                return False
+
+            def get_input_for_field(field_key):
+                # 1) aria-label, 2) by text nearby; last winner first (locator cache)
+                field_names = self._t(field_key)
+                xps = [f"//input[contains(@aria-label,'{name}')]" for name in field_names]
+                for name in field_names:
+                    for txt in [f"{name}:", name]:
+                        xps += [
+                            f"//*[normalize-space()='{txt}']/following::input[contains(@id,'-inner')][1]",
+                            f"//*[normalize-space()='{txt}']/ancestor::*[contains(@class,'sapUiFormElement')][1]//input[contains(@id,'-inner')]",
+                        ]
+
+                target = f"field:{field_key}"
+                for xp in self._ordered(target, xps):
+                    try:
+                        el = WebDriverWait(self.driver, 2).until(EC.presence_of_element_located((By.XPATH, xp)))
+                        if el.is_displayed():
+                            self._remember(target, xp)
+                            return el
+                    except:
+                        pass
+                self._forget(target)
+                return None
+
+            def set_input_value(inp, val, confirm_tab=True):
+                if not inp:
+                    return False
+                _scroll_into_view(inp)
+                try:
+                    inp.click()
+                except:
+                    self.driver.execute_script("arguments[0].click();", inp)
+                inp.send_keys(Keys.CONTROL, 'a')
+                inp.send_keys(Keys.BACKSPACE)
+                inp.send_keys(str(val))
+                if confirm_tab:
+                    inp.send_keys(Keys.TAB)
+                    self._wait_ui_idle(timeout=3)
+                return True
+
+            def fill_via_ui5():
+                """Fast mode: set all three quantities through the UI5 controls in one script call,
+                then one read to validate. False means the keystroke path has to do it."""
+                fields = [{"key": key, "paths": list(QTY_FIELD_BINDINGS[key]), "labels": self._t(key), "value": str(val)}
+                          for key, val in (("yield", yield_qty), ("scrap", scrap_qty), ("rework", rework_qty))]
+                try:
+                    filled = self.driver.execute_script(UI5_FILL_SCRIPT, fields)
+                    if not filled or filled.get("missing"):
+                        print(f"⚠️ UI5 fill: controls not resolved ({filled and filled.get('missing')}), using keystrokes")
+                        return False
+                    self._wait_ui_idle(timeout=3)
+                    shown = self.driver.execute_script(
+                        UI5_READ_SCRIPT, {key: c["id"] for key, c in filled["controls"].items()})
+                except WebDriverException as e:
+                    print(f"⚠️ UI5 fill failed: {e.__class__.__name__}, using keystrokes")
+                    return False
+                rejected = [f["key"] for f in fields
+                            if not shown.get(f["key"]) or shown[f["key"]]["state"] == "Error"
+                            or parse_quantity(shown[f["key"]]["value"], self._ui_language()) != parse_quantity(f["value"])]
+                if rejected:
+                    print(f"⚠️ UI5 fill not accepted for {rejected}, using keystrokes")
+                    return False
+                via = ", ".join(f"{key}: {c['via']}" for key, c in filled["controls"].items())
+                print(f"⚡️ Quantities set via UI5 controls ({via})")
+                return True
+
+            def load_reason_catalogue(lang):
+                """Reads the reason catalogue once per session: from the control's own items if it
+                has them, else from the value-help dialog (opened and closed once)."""
+                field = {"paths": list(REASON_FIELD_BINDINGS), "labels": self._t("reason")}
+                try:
+                    found = self.driver.execute_script(UI5_REASON_ITEMS_SCRIPT, field)
+                    if not found:
+                        return False
+                    items = found["items"]
+                    if not items and open_reason_value_help():
+                        self._wait_ui_idle(timeout=5)
+                        items = self.driver.execute_script(UI5_DIALOG_ITEMS_SCRIPT) or []
+                        press_esc(1)
+                except WebDriverException as e:
+                    print(f"⚠️ Reason catalogue not readable: {e.__class__.__name__}")
+                    return False
+                self.reasons.load(items, lang)
+                print(f"📚 Reason catalogue loaded ({len(self.reasons.entries)} entries, {lang})")
+                return bool(self.reasons.entries)
+
+            def set_reason_from_catalogue(reason_text):
+                """Fast path: match the spoken reason locally and set its key on the reason input.
+                False means the value-help dialog has to do it."""
+                lang = self._ui_language()
+                if self.reasons.stale(lang) and not load_reason_catalogue(lang):
+                    return False
+                entry = self.reasons.match(reason_text)
+                if entry is None:
+                    print(f"⚠️ Reason '{reason_text}' not in catalogue")
+                    return False
+                key = entry.get("key") or entry.get("text")
+                field = {"key": "reason", "paths": list(REASON_FIELD_BINDINGS), "labels": self._t("reason"),
+                         "value": key, "selectedKey": key}
+                try:
+                    filled = self.driver.execute_script(UI5_FILL_SCRIPT, [field])
+                    if not filled or filled.get("missing"):
+                        return False
+                    self._wait_ui_idle(timeout=3)
+                    shown = self.driver.execute_script(UI5_READ_SCRIPT, {"reason": filled["controls"]["reason"]["id"]})
+                except WebDriverException as e:
+                    print(f"⚠️ Setting reason failed: {e.__class__.__name__}")
+                    return False
+                if not shown.get("reason") or shown["reason"]["state"] == "Error" or not shown["reason"]["value"]:
+                    # The catalogue does not fit this form (anymore): read it again next time.
+                    self.reasons.reset()
+                    return False
+                print(f"⚡️ Reason set from catalogue: {key} ({entry.get('text')})")
+                return True
+
+            def open_reason_value_help():
+                reason_inp = get_input_for_field("reason")
+                if not reason_inp:
+                    print("❌ Reason/Grund input not found")
+                    return False
+
+                _scroll_into_view(reason_inp)
+
+                # Try F4
+                try:
+                    reason_inp.click()
+                    reason_inp.send_keys(Keys.F4)
+                    WebDriverWait(self.driver, 2).until(
+                        EC.presence_of_element_located((By.XPATH, f"//*[{xp_any('.', self._t('select_reason'), op='contains')}]"))
+                    )
+                    return True
+                except:
+                    pass
+
+                # Click value help icon (two squares)
+                icon_xps = [
+                    "./following::button[1]",
+                    "./following::*[contains(@class,'sapMInputBaseIconContainer')][1]",
+                    "./following::span[contains(@class,'sapMInputValHelp')][1]",
+                    ".//button[.//span[contains(@class,'sapMInputValHelp')]]",
+                    ".//*[contains(@class,'sapMInputBaseIcon')]",
+                ]
+                for xp in icon_xps:
+                    try:
+                        el = reason_inp.find_element(By.XPATH, xp)
+                        if el.is_displayed():
+                            return _safe_click(el)
+                    except:
+                        pass
+                return False
+
+            def select_reason(reason_text):
+                raw = (reason_text or '').strip()
+                if not raw:
+                    return False
+
+                # Language of popup = session UI language (page heuristic only if unknown)
+                popup_is_german = self._ui_language() == "de"
+                if self._ui_language() == "unknown":
+                    try:
+                        page = self.driver.page_source
+                        popup_is_german = ('Abweichungsgrund' in page) or ('auswählen' in page)
+                    except:
+                        pass
+
+                # Normalize + map EN -> DE only if popup is German
+                t = raw.lower()
+                if popup_is_german:
+                    t = REASON_EN_DE.get(t, t)
+
+                # If user already passed German words, accept them
+                # (e.g., 'Maschinenschaden')
+                t = t.strip().lower()
+
+                # Type into search (no TAB)
+                try:
+                    search = WebDriverWait(self.driver, 2).until(
+                        EC.presence_of_element_located((By.XPATH, f"//input[{xp_any('@placeholder', self._t('search'))}]"))
+                    )
+                    search.click()
+                    search.send_keys(Keys.CONTROL, 'a')
+                    search.send_keys(Keys.BACKSPACE)
+                    search.send_keys(t)
+                    self._wait_ui_idle(timeout=5)
+                except:
+                    pass
+
+                # Click matching row (LI or TR). Use contains on lowercase text.
+                li_xpath = (
+                    "//li[.//*[contains(translate(normalize-space(),"
+                    " 'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'),"
+                    f" '{t}')]]"
+                )
+                tr_xpath = (
+                    "//tr[.//*[contains(translate(normalize-space(),"
+                    " 'ABCDEFGHIJKLMNOPQRSTUVWXYZ','abcdefghijklmnopqrstuvwxyz'),"
+                    f" '{t}')]]"
+                )
+
+                for xp in [li_xpath, tr_xpath]:
+                    try:
+                        el = WebDriverWait(self.driver, 6).until(EC.element_to_be_clickable((By.XPATH, xp)))
+                        _safe_click(el)
+                        self._wait_ui_idle(timeout=3)
+                        # Some UI5 dialogs need Enter to confirm selection
+                        try:
+                            ActionChains(self.driver).send_keys(Keys.ENTER).perform()
+                        except:
+                            pass
+                        return True
+                    except:
+                        pass
+
+                return False
+
+            # ---------- MAIN FLOW ----------
+            # Navigate to correct order/op using existing open_app
+            nav = self.open_app(
+                personnel_number=personnel_number,
+                operation_filter=operation_filter,
+                order_id=order_id,
+                app_name="Capture of production data",
+            )
+            if isinstance(nav, dict) and nav.get('status') == 'error':
+                return nav
+
+            self._wait_ui_idle(timeout=15)
+            close_any_popups()
+
+            # Open Qty Confirmation / Mengenrückmeldung
+            if not click_bilingual_button(self._t("qty_confirmation")):
+                return {"status": "error", "message": "Could not click Qty Confirmation/Mengenrückmeldung"}
+
+            self._wait_ui_idle()
+            close_any_popups()
+
+            # Fill fields: UI5 control API first, keystrokes as fallback
+            if QTY_FILL_MODE == "ui5" and fill_via_ui5():
+                ok1 = ok2 = ok3 = True
+            else:
+                y_inp = get_input_for_field("yield")
+                s_inp = get_input_for_field("scrap")
+                r_inp = get_input_for_field("rework")
+
+                ok1 = set_input_value(y_inp, yield_qty)
+                ok2 = set_input_value(s_inp, scrap_qty)
+                ok3 = set_input_value(r_inp, rework_qty)
+
+            if not (ok1 and ok2 and ok3):
+                # TAB fallback: start at Yield, then type in active elements
+                y = y_inp
+                if not y:
+                    return {"status": "error", "message": "Could not find Yield/Gutmenge input"}
+                actions = ActionChains(self.driver)
+
+                set_input_value(y, yield_qty)  # ends with TAB
+
+                # Now at Scrap
+                self.driver.switch_to.active_element.send_keys(Keys.CONTROL, 'a')
+                self.driver.switch_to.active_element.send_keys(Keys.BACKSPACE)
+                self.driver.switch_to.active_element.send_keys(str(scrap_qty))
+
+                # TAB -> Rework
+                actions.send_keys(Keys.TAB).perform()
+                self._wait_ui_idle(timeout=3)
+
+                self.driver.switch_to.active_element.send_keys(Keys.CONTROL, 'a')
+                self.driver.switch_to.active_element.send_keys(Keys.BACKSPACE)
+                self.driver.switch_to.active_element.send_keys(str(rework_qty))
+                self._wait_ui_idle(timeout=3)
+
+            # Reason: catalogue key first, value help as fallback
+            if reason and str(reason).strip() and not set_reason_from_catalogue(str(reason).strip()):
+                close_any_popups()
+                if not open_reason_value_help():
+                    return {"status": "error", "message": "Could not open Reason/Grund value help"}
+                if not select_reason(str(reason).strip()):
+                    return {"status": "error", "message": f"Could not select reason: {reason}"}
+                self._wait_ui_idle()
+                close_any_popups()
+
+            # Click Save (EN) / Speichern / Sichern (DE)
+            save_texts = self._t("save")
+            if not click_bilingual_button(save_texts):
+                # fallback xpath with bdi
+                try:
+                    save_btn = WebDriverWait(self.driver, 6).until(
+                        EC.element_to_be_clickable((
+                            By.XPATH,
+                            f"//button[.//bdi[{xp_any('normalize-space()', save_texts)}] "
+                            f"or {xp_any('normalize-space()', save_texts)}]"
+                        ))
+                    )
+                    if not _safe_click(save_btn):
+                        return {"status": "error", "message": "Could not click Save/Speichern/Sichern"}
+                except Exception as e:
+                    return {"status": "error", "message": f"Could not find Save/Speichern/Sichern button: {e}"}
+
+            return {"status": "success", "message": "Qty confirmation submitted"}
+
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            return {"status": "error", "message": f"qty_confirmation crashed: {e}"}
+
+# ▼▼▼ Intelligent Processing (Bilingual: EN/DE) ▼▼▼
+    def process_order_step(self, personnel_number, operation_filter, order_id, phase, action_type):
+        print(f"Executing: {action_type} {phase} | Order: {order_id} | OpFilter: {operation_filter}")
+        self._start_driver_if_not_running()
+
+        # Button texts from the central table, in the session's UI language
+        lang = self._ui_language()
+        possible_texts = step_button_texts(action_type, phase, lang)
+
+        step_target = f"step button:{action_type} {phase}"
+        possible_texts = self._ordered(step_target, possible_texts)
+        print(f"🔍 Looking for buttons: {possible_texts}")
+
+        def click_step_button(texts, timeout=1.0):
+            """Clicks the first button showing one of `texts`; returns that text or None."""
+            texts = list(texts)
+            winner = self._click_first([(By.XPATH, f"//button[.//text()='{t}']") for t in texts], timeout)
+            return texts[winner] if winner is not None else None
+
+        def clear_popups():
+            try:
+                ActionChains(self.driver).send_keys(Keys.ESCAPE).perform()
+                close_btns = self.driver.find_elements(By.XPATH, f"//button[{xp_any('@title', self._t('close'))}]")
+                for btn in close_btns:
+                    if btn.is_displayed(): btn.click()
+            except: pass
+
+        # --- Smart Check (page state + URL hash instead of scanning the DOM) ---
+        app_name = "Capture of production data"
+        looks_like_correct_page = bool(order_id) and self._is_at(app_name, order_id, operation_filter,
+                                                                 personnel_number)
+        if looks_like_correct_page:
+            print(f"✅ Still on Order/Auftrag {order_id} (Op/Vorgang {operation_filter or 'any'}).")
+
+        if looks_like_correct_page:
+            clear_popups()
+            txt = click_step_button(possible_texts)
+            if txt:
+                self._remember(step_target, txt)
+                self.page_state.update(url_hash=self._current_hash())
+                return {"status": "success", "message": f"Executed {txt} (Instant)"}
+
+            if action_type == "end":
+                print(f"⚠️ Attempting other Finish/Beenden buttons...")
+                t = click_step_button(t for p_key in ["setup", "processing", "teardown"]
+                                      for t in step_button_texts("end", p_key, lang))
+                if t:
+                    self.page_state.update(url_hash=self._current_hash())
+                    return {"status": "success", "message": f"Executed {t} (Auto-Fix)"}
+
+            print("❌ Button not found, preparing to refresh...")
+
+        # --- Fallback Navigation ---
+        print("🔄 Executing full navigation flow...")
+        # 注意：这里我们依然传英文名，open_app 通过中央翻译表找到德文名
+        nav_result = self.open_app(
+            personnel_number,
+            operation_filter,
+            order_id,
+            app_name
+        )
+        if nav_result["status"] == "error": return nav_result
+
+        self._wait_ui_idle(timeout=15)
+        clear_popups()
+        
+        txt = click_step_button(possible_texts, timeout=2.0)
+        if txt:
+            self._remember(step_target, txt)
+            self.page_state.update(url_hash=self._current_hash())
+            return {"status": "success", "message": f"Executed {txt} after nav"}
+
+        self._forget(step_target)
+        return {"status": "error", "message": f"Could not find button. Tried: {possible_texts}"}
+    
+    # ▼▼▼ Next/Previous/Quit (Bilingual) ▼▼▼
+    def next_order(self):
+        print("Executing workflow: next_order...")
+        jumped = self._jump_in_worklist(1, "Next/Nächster")
+        if jumped:
+            return jumped
+        strategies = self._nav_strategies("next") + [
+            (By.XPATH, "//span[contains(@class, 'sapUiIcon') and @data-sap-ui-icon-content='']")
+        ]
+        return self._click_nav_button(strategies, "Next/Nächster", target="next button")
+
+    def previous_order(self):
+        print("Executing workflow: previous_order...")
+        jumped = self._jump_in_worklist(-1, "Previous/Vorheriger")
+        if jumped:
+            return jumped
+        strategies = self._nav_strategies("previous") + [
+            (By.XPATH, "//span[contains(@class, 'sapUiIcon') and @data-sap-ui-icon-content='']")
+        ]
+        return self._click_nav_button(strategies, "Previous/Vorheriger", target="previous button")
+
+    def _current_hash(self):
+        try:
+            return self.driver.execute_script("return window.location.hash") or ""
+        except WebDriverException:
+            return ""
+
+    def _is_at(self, app=None, order_id=None, operation=None, personnel_number=None):
+        """Cheap position check: the recorded PageState plus one script call for the URL hash."""
+        if not self.page_state.is_at(app, order_id, operation, personnel_number):
+            return False
+        current = self._current_hash()
+        if current != self.page_state.url_hash:
+            print("↪️ URL hash changed since last action, page state is stale.")
+            self.page_state.reset()
+            return False
+        return True
+
+    def _record_position(self, app, personnel_number, order_id, operation_filter):
+        self.page_state.update(app=app, personnel_number=personnel_number, order_id=order_id,
+                               operation=operation_filter or None, url_hash=self._current_hash())
+
+    def _submit_personnel_number(self, personnel_number, timeout=5):
+        """Fills the personnel-number dialog if it is shown; returns False when there is none."""
+        try:
+            pn_input = WebDriverWait(self.driver, timeout).until(EC.element_to_be_clickable(
+                (By.XPATH, "//input[contains(@id, 'inputPerNr')]")
+            ))
+        except TimeoutException:
+            return False
+        pn_input.clear()
+        pn_input.send_keys(personnel_number)
+        for label in self._t("submit"):
+            try:
+                self.driver.find_element(By.XPATH, f"//*[text()='{label}']").click()
+                break
+            except: pass
+        else:
+            pn_input.send_keys(Keys.ENTER)
+        return True
+
+    def _open_via_intent(self, app_name, personnel_number, order_id, operation_filter):
+        """Deep link straight to the filtered app view. False if the intent is unknown or the
+        page did not land on it (a learned intent is then dropped)."""
+        url = INTENT_REGISTRY.url_for(app_name, order_id=order_id, operation_filter=operation_filter,
+                                      personnel_number=personnel_number)
+        if not url:
+            return False
+        print(f"🔗 Deep link: {url}")
+        intent = url.split("#", 1)[1].split("?")[0]
+        try:
+            self.driver.get(url)
+            self._wait_ui_idle(timeout=20)
+            if self._submit_personnel_number(personnel_number, timeout=1):
+                self._wait_ui_idle(timeout=15)
+            landed = self._current_hash().lstrip("#")
+        except WebDriverException as e:
+            print(f"⚠️ Deep link failed: {e.__class__.__name__}")
+            landed = ""
+        if landed.startswith(intent):
+            return True
+        print("⚠️ Deep link did not land on the app, falling back to tile navigation...")
+        INTENT_REGISTRY.forget(app_name)
+        return False
+
+    def _snapshot_worklist(self, personnel_number, force=False):
+        """Reads the worklist table model in one script call unless the snapshot is still fresh."""
+        if not force and not self.worklist.stale(personnel_number):
+            return True
+        try:
+            found = self.driver.execute_script(
+                UI5_WORKLIST_SCRIPT, list(WORKLIST_ORDER_FIELDS), list(WORKLIST_OPERATION_FIELDS))
+        except WebDriverException as e:
+            print(f"⚠️ Worklist snapshot failed: {e.__class__.__name__}")
+            return False
+        if found and found.get("filtered"):
+            print("📋 Worklist table is filtered, not taking a snapshot.")
+            return False
+        if not found or not found["rows"]:
+            return False
+        delta = self.worklist.refresh(found["rows"], personnel_number, found["table"])
+        print(f"📋 Worklist snapshot: {len(self.worklist.rows)} rows of {found['total']} {delta}")
+        return True
+
+    def _open_from_worklist(self, personnel_number, order_id, operation_filter):
+        """Opens the order's row straight from the worklist snapshot; False if it is not there
+        (the caller filters and searches the table instead)."""
+        if not order_id or not self._snapshot_worklist(personnel_number):
+            return False
+        row = self.worklist.find(order_id, operation_filter or None)
+        if row is None:
+            return False
+        try:
+            opened = self.driver.execute_async_script(
+                UI5_WORKLIST_OPEN_SCRIPT, self.worklist.table_id, row["order_id"], row["operation"],
+                list(WORKLIST_ORDER_FIELDS), list(WORKLIST_OPERATION_FIELDS))
+        except WebDriverException as e:
+            print(f"⚠️ Worklist jump failed: {e.__class__.__name__}")
+            opened = False
+        if not opened:
+            # Table changed under the snapshot: read it again next time.
+            self.worklist.refreshed_at = None
+            return False
+        self._wait_ui_idle(timeout=15)
+        return True
+
+    def _jump_in_worklist(self, step, name):
+        """next/previous without the Next/Previous buttons: the neighbour row from the worklist
+        snapshot, opened by deep link. None when the snapshot or the intent cannot say."""
+        ps = self.page_state
+        if not (ps.app and ps.order_id) or self.worklist.stale(ps.personnel_number):
+            return None
+        target = self.worklist.neighbour(ps.order_id, ps.operation, step)
+        if target is None or not INTENT_REGISTRY.template(ps.app):
+            return None
+        print(f"⚡️ {name} from worklist: order {target['order_id']} (position {target['position']})")
+        result = self.open_app(ps.personnel_number or "1", target["operation"], target["order_id"], ps.app)
+        if result.get("status") != "success":
+            return None
+        return {"status": "success", "message": f"Clicked {name}",
+                "order_id": target["order_id"], "operation": target["operation"]}
+
+    def _learn_intent(self, app_name, personnel_number, order_id, operation_filter):
+        self._wait_ui_idle(timeout=20)
+        url_hash = self._current_hash()
+        INTENT_REGISTRY.learn(app_name, url_hash, order_id=order_id,
+                              operation_filter=operation_filter, personnel_number=personnel_number)
+
+    def _nav_strategies(self, key):
+        texts = self._t(key)
+        return ([(By.XPATH, f"//button[.//text()='{t}']") for t in texts] +
+                [(By.XPATH, f"//button[.//bdi[contains(text(), '{t}')]]") for t in texts] +
+                [(By.CSS_SELECTOR, f"button[title='{t}']") for t in texts])
+
+    def _click_nav_button(self, strategies, name, target=None):
+        self._start_driver_if_not_running()
+        print(f"🔍 Starting search for {name} button...")
+        try: ActionChains(self.driver).send_keys(Keys.ESCAPE).perform()
+        except: pass
+
+        target = target or name
+        strategies = self._ordered(target, strategies)
+        winner = self._click_first(strategies)
+        if winner is not None:
+            by, val = strategies[winner]
+            print(f"✅ Clicked {name}: {val}")
+            self._remember(target, (by, val))
+            self._wait_ui_idle(timeout=15)
+            # Another order is shown now; which one is not known without reading the page.
+            self.page_state.update(order_id=None, operation=None, url_hash=self._current_hash())
+            return {"status": "success", "message": f"Clicked {name}"}
+
+        self._forget(target)
+        return {"status": "error", "message": f"Not found {name}"}
+
+    def _click_first(self, candidates, timeout=1.0):
+        """Clicks the first visible, enabled element among ordered (By, locator) candidates in a
+        single async script call (see CLICK_FIRST_SCRIPT). Returns the winner's index or None."""
+        candidates = list(candidates)
+        if not candidates:
+            return None
+        try:
+            hit = self.driver.execute_async_script(
+                CLICK_FIRST_SCRIPT, [[by, val] for by, val in candidates], CLICK_HIGHLIGHT, int(timeout * 1000))
+        except WebDriverException as e:
+            print(f"⚠️ Click resolver failed: {e.__class__.__name__}")
+            return None
+        if not hit:
+            return None
+        print(f"⚡️ Clicked '{hit.get('text') or candidates[hit['index']][1]}'")
+        return hit["index"]
+
+    def quit(self):
+        global SHARED_DRIVER
+        if self.driver:
+            if self._credentials:
+                self._save_session()
+            try: self.driver.quit()
+            except: pass
+            if self.shared and SHARED_DRIVER is self.driver:
+                SHARED_DRIVER = None
+            self.driver = None
+            self.page_state.reset()
+            self.worklist.reset()
+            self._session_checked_at = 0.0
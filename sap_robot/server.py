@@ -0,0 +1,1228 @@
+##################################################################
+# sap_robot.server: Async Robot Server (aiohttp)
+##################################################################
+from aiohttp import web
+import asyncio
+import collections
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import re
+import sqlite3
+import threading 
+import time
+import traceback
+import uuid
+import zlib
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+from .common import STARTUP
+from .intents import INTENT_REASONS, LLM_INTENT_CACHE, PROMPT_PATH, resolve_intent
+from .odata import BACKEND_MODE, odata_backend
+from .pool import POOL_SIZE, SapRobotPool
+from .vocabulary import VOCABULARY_MATCHER
+
+if TYPE_CHECKING:
+    from .robot import SapRobot
+
+robot_pool = SapRobotPool()
+
+# ▼▼▼ Command Schemas (reject bad commands before they reach the browser) ▼▼▼
+class CommandError(ValueError):
+    """A command that could not be extracted or failed its schema; `errors` lists
+    {"field", "message"} pairs for the reply."""
+
+    def __init__(self, errors, action=None):
+        super().__init__("; ".join(f"{e['field'] or 'command'}: {e['message']}" for e in errors))
+        self.errors = errors
+        self.action = action
+
+    def as_response(self):
+        return {"status": "rejected", "action": self.action, "message": str(self), "errors": self.errors}
+
+ORDER_PHASES = ("setup", "processing", "teardown")
+BATCH_ERROR_POLICIES = ("stop", "continue")
+QTY_REASONS = tuple(reason for reason, _ in INTENT_REASONS) + ("",)
+DIGITS = re.compile(r"\d+")
+OPTIONAL_DIGITS = re.compile(r"\d*")
+QUANTITY = re.compile(r"\d+(?:[.,]\d+)?")
+ANY_PARAMS = ("chat_id",)  # accepted on every action (session routing)
+
+# param -> (required, rule); rule is a compiled regex (full match), a tuple of allowed
+# values, None for "any string" (non-empty when required) or list for a JSON array.
+_ORDER_PARAMS = {
+    "order_id": (True, DIGITS),
+    "personnel_number": (False, DIGITS),
+    "operation_filter": (False, OPTIONAL_DIGITS),
+    "op_plant": (False, None),
+}
+COMMAND_SCHEMAS = {
+    "login": {"username": (True, None), "password": (True, None)},
+    "open_app": dict(_ORDER_PARAMS, app_name=(True, None)),
+    "start_order": dict(_ORDER_PARAMS, phase=(False, ORDER_PHASES)),
+    "end_order": dict(_ORDER_PARAMS, phase=(False, ORDER_PHASES)),
+    "qty_confirmation": dict(_ORDER_PARAMS, yield_qty=(False, QUANTITY), scrap_qty=(False, QUANTITY),
+                             rework_qty=(False, QUANTITY), reason=(False, QTY_REASONS)),
+    "next_order": {},
+    "previous_order": {},
+    "quit": {},
+    "batch": {"commands": (True, list), "on_error": (False, BATCH_ERROR_POLICIES)},
+}
+
+def _compile_rule(name, required, rule):
+    """One check per parameter, decided once here instead of on every command."""
+    if rule is list:
+        def check(value):
+            if not isinstance(value, list) or (required and not value):
+                return "must be a non-empty list"
+    elif isinstance(rule, tuple):
+        allowed = frozenset(rule)
+
+        def check(value):
+            if value not in allowed:
+                return f"must be one of {list(rule)}"
+    else:
+        def check(value):
+            if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+                return "must be a string"
+            text = str(value)
+            if required and not text:
+                return "must not be empty"
+            if rule is not None and not rule.fullmatch(text):
+                return f"must match {rule.pattern}"
+    return name, required, check
+
+COMPILED_SCHEMAS = {
+    action: [_compile_rule(name, required, rule) for name, (required, rule) in spec.items()]
+    for action, spec in COMMAND_SCHEMAS.items()
+}
+
+def prompt_actions(path=PROMPT_PATH):
+    """Action names declared in Prompt_AI_Agent.txt ('12) "pause_toggle"')."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return re.findall(r'^\d+\)\s*"(\w+)"', f.read(), re.M)
+    except OSError as e:
+        print(f"⚠️ Agent prompt not readable ({e}); prompt actions cannot be checked")
+        return []
+
+PROMPT_ACTIONS = prompt_actions()
+UNSUPPORTED_PROMPT_ACTIONS = sorted(set(PROMPT_ACTIONS) - set(COMMAND_SCHEMAS))
+if UNSUPPORTED_PROMPT_ACTIONS:
+    print(f"⚠️ Prompt declares actions the robot does not implement: {UNSUPPORTED_PROMPT_ACTIONS}")
+
+def _schema_errors(command, prefix=""):
+    if not isinstance(command, dict):
+        return None, [{"field": prefix.rstrip("."), "message": "must be a JSON object"}]
+    action = command.get("action")
+    if action not in COMPILED_SCHEMAS:
+        message = ("declared in the prompt but not implemented by the robot" if action in PROMPT_ACTIONS
+                   else "missing" if not action else "unknown action")
+        return action, [{"field": prefix + "action", "message": message}]
+    params = command.get("params", {})
+    if params is None:
+        params = {}
+    if not isinstance(params, dict):
+        return action, [{"field": prefix + "params", "message": "must be a JSON object"}]
+
+    errors = []
+    for name, required, check in COMPILED_SCHEMAS[action]:
+        if name not in params:
+            if required:
+                errors.append({"field": f"{prefix}params.{name}", "message": "required"})
+            continue
+        problem = check(params[name])
+        if problem:
+            errors.append({"field": f"{prefix}params.{name}", "message": problem})
+    known = COMMAND_SCHEMAS[action]
+    errors.extend({"field": f"{prefix}params.{name}", "message": "unexpected parameter"}
+                  for name in params if name not in known and name not in ANY_PARAMS)
+
+    if action == "batch" and isinstance(params.get("commands"), list):
+        for index, step in enumerate(params["commands"]):
+            step_prefix = f"{prefix}params.commands[{index}]."
+            if isinstance(step, dict) and step.get("action") == "batch":
+                errors.append({"field": step_prefix + "action", "message": "nested batches are not supported"})
+                continue
+            errors.extend(_schema_errors(step, step_prefix)[1])
+    return action, errors
+
+def validate_command(command):
+    """Raises CommandError unless `command` matches its action's schema."""
+    action, errors = _schema_errors(command)
+    if errors:
+        raise CommandError(errors, action)
+    return command
+
+def extract_command(data_wrapper: dict):
+    """Returns the command dict from a bare command or an n8n {"output": "..."} wrapper;
+    raises CommandError saying why when there is none."""
+    if not isinstance(data_wrapper, dict):
+        raise CommandError([{"field": "", "message": "must be a JSON object"}])
+    if "action" in data_wrapper:
+        return data_wrapper
+
+    output_string = data_wrapper.get("output", "")
+    if not output_string or not isinstance(output_string, str):
+        raise CommandError([{"field": "", "message": "needs 'action' or an 'output' string"}])
+
+    s = output_string.find('{')
+    e = output_string.rfind('}')
+    if s == -1 or e == -1:
+        raise CommandError([{"field": "output", "message": "contains no JSON object"}])
+    json_str = output_string[s:e+1]
+    print(f"🔍 Extracting: {json_str}")
+
+    try:
+        command = json.loads(json_str)
+    except json.JSONDecodeError as err:
+        print("⚠️ JSON Error, applying auto-fix...")
+        try: command = json.loads(json_str + "}")
+        except json.JSONDecodeError: raise CommandError([{"field": "output", "message": f"invalid JSON: {err}"}])
+    if not isinstance(command, dict):
+        raise CommandError([{"field": "output", "message": "must be a JSON object"}])
+    return command
+
+def load_command(data_wrapper: dict):
+    """extract_command + validate_command."""
+    return validate_command(extract_command(data_wrapper))
+
+def parse_command(data_wrapper: dict):
+    """Like extract_command, but returns None instead of raising (routing/coalescing keys)."""
+    try:
+        return extract_command(data_wrapper)
+    except CommandError:
+        return None
+
+def session_key(data_wrapper: dict):
+    """Operator key for the robot pool: Telegram chat id if n8n sends one, else personnel number."""
+    if isinstance(data_wrapper, dict) and data_wrapper.get("chat_id"):
+        return f"chat:{data_wrapper['chat_id']}"
+    command_json = parse_command(data_wrapper) or {}
+    params = command_json.get("params") or {}
+    if command_json.get("action") == "batch" and params.get("commands"):
+        # A batch runs on one browser: key it by its first step.
+        first = params["commands"][0]
+        params = (first.get("params") if isinstance(first, dict) else None) or {}
+    if params.get("chat_id"):
+        return f"chat:{params['chat_id']}"
+    return f"pn:{params.get('personnel_number') or '1'}"
+
+def dispatch_action(data_wrapper: dict, robot: "SapRobot" = None):
+    print(f"Received data wrapper: {data_wrapper}")
+
+    try:
+        command_json = load_command(data_wrapper)
+    except CommandError as e:
+        print(f"⛔ Rejected: {e}")
+        return e.as_response()
+
+    if robot is None:
+        with robot_pool.session(session_key(data_wrapper)) as pooled:
+            return dispatch_action(command_json, pooled)
+
+    try:
+        action = command_json.get("action")
+        params = command_json.get("params", {}) 
+
+        print(f"▶️ Dispatching: {action} | Params: {params}")
+        result = None
+
+        if action not in ("login", "quit", "batch"):
+            # Batch steps come through here one by one; the check itself is throttled.
+            expired = robot.ensure_session()
+            if expired is not None:
+                print(f"✅ Result: {expired}")
+                return expired
+
+        if action == "login":
+            result = robot.login(**params)
+
+        elif action == "open_app":
+            safe = {
+                "personnel_number": params.get("personnel_number", "1"),
+                "operation_filter": params.get("operation_filter", ""),
+                "order_id": params.get("order_id"),
+                "app_name": params.get("app_name"),
+            }
+            safe = {k: v for k, v in safe.items() if v is not None}
+            result = robot.open_app(**safe)
+
+        elif action in ["start_order", "end_order"]:
+            p_type = "start" if action == "start_order" else "end"
+            result = robot.process_order_step(
+                personnel_number=params.get("personnel_number", "1"),
+                operation_filter=params.get("operation_filter", ""),
+                order_id=params.get("order_id"),
+                phase=params.get("phase", "processing"),
+                action_type=p_type,
+            )
+
+        elif action == "qty_confirmation":
+            result = robot.qty_confirmation(
+                personnel_number=params.get("personnel_number", "1"),
+                operation_filter=params.get("operation_filter", ""),
+                order_id=params.get("order_id"),
+                yield_qty=params.get("yield_qty", "0"),
+                scrap_qty=params.get("scrap_qty", "0"),
+                rework_qty=params.get("rework_qty", "0"),
+                reason=params.get("reason", ""),
+            )
+
+        elif action == "next_order":
+            result = robot.next_order()
+
+        elif action == "previous_order":
+            result = robot.previous_order()
+
+        elif action == "batch":
+            result = run_batch(robot, params.get("commands", []), params.get("on_error", "stop"))
+
+        elif action == "quit":
+            result = robot.quit()
+
+        else:
+            result = {"status": "error", "message": f"Unknown action: {action}"}
+        print(f"✅ Result: {result}")
+        return result
+
+    except Exception as e:
+        print(f"!! Error in dispatch: {e}")
+        traceback.print_exc()
+        return {"status": "error", "message": f"Dispatch crashed: {e}"}
+
+# ▼▼▼ Batch (several steps in one browser pass) ▼▼▼
+def run_batch(robot: "SapRobot", commands, on_error="stop"):
+    """Runs `commands` in order on one robot, so page state and navigation carry over between
+    steps. on_error="stop" ends the batch at the first failed step, "continue" runs the rest."""
+    if on_error not in BATCH_ERROR_POLICIES:
+        return {"status": "error", "message": f"on_error must be one of {BATCH_ERROR_POLICIES}"}
+
+    steps = []
+    started = time.perf_counter()
+    for index, command in enumerate(commands):
+        t0 = time.perf_counter()
+        action = command.get("action") if isinstance(command, dict) else None
+        if action == "batch":
+            result = {"status": "error", "message": "Nested batches are not supported"}
+        else:
+            result = dispatch_action(command, robot)
+        ok = not (isinstance(result, dict) and result.get("status") in ("error", "rejected")) and action is not None
+        steps.append({"index": index, "action": action, "ok": ok, "result": result,
+                      "duration_s": round(time.perf_counter() - t0, 3)})
+        if not ok and on_error == "stop":
+            break
+
+    succeeded = sum(1 for step in steps if step["ok"])
+    if succeeded == len(commands):
+        status = "success"
+    elif succeeded:
+        status = "partial"
+    else:
+        status = "error"
+    return {
+        "status": status,
+        "message": f"{succeeded}/{len(commands)} steps succeeded",
+        "steps": steps,
+        "skipped": len(commands) - len(steps),
+        "duration_s": round(time.perf_counter() - started, 3),
+    }
+
+# ▼▼▼ Job Store (results of queued commands) ▼▼▼
+JOB_RETENTION = int(os.environ.get("SAP_ROBOT_JOB_RETENTION", "500"))
+JOB_TTL = float(os.environ.get("SAP_ROBOT_JOB_TTL", "3600"))
+MAX_WAIT_S = 120
+
+# ▼▼▼ Command Journal (queued work survives a crash or restart) ▼▼▼
+JOURNAL_PATH = os.environ.get(
+    "SAP_ROBOT_JOURNAL", os.path.join(os.path.expanduser("~"), ".sap_robot_journal.sqlite3"))  # "" = off
+JOURNAL_BATCH_MAX = int(os.environ.get("SAP_ROBOT_JOURNAL_BATCH", "500"))
+JOURNAL_SYNC_TIMEOUT = float(os.environ.get("SAP_ROBOT_JOURNAL_SYNC_TIMEOUT", "2"))
+# Interrupted while running, these may already be booked in SAP: failed instead of run again.
+JOURNAL_UNSAFE_REPLAY = ("qty_confirmation", "batch")
+# Accepted longer ago than this, a pending command is stale (a weekend outage must not book
+# Friday's quantities on Monday): marked failed on startup instead of replayed.
+JOURNAL_REPLAY_MAX_AGE = float(os.environ.get("SAP_ROBOT_JOURNAL_REPLAY_MAX_AGE", "3600"))
+
+def _carries_password(command):
+    """True for login commands and batches with a login step: those are never written to disk."""
+    if isinstance(command, dict):
+        return any(key == "password" or _carries_password(value) for key, value in command.items())
+    if isinstance(command, list):
+        return any(_carries_password(value) for value in command)
+    # LLM wrappers carry the command as a JSON string ({"output": "..."}).
+    return isinstance(command, str) and '"password"' in command
+
+class CommandJournal:
+    """Append-only SQLite log (WAL) of job state changes: accepted (with the command), running,
+    succeeded and failed (with the result). One writer thread commits everything queued since
+    its last commit in one transaction (group commit), so callers only enqueue; sync() waits
+    until what was appended so far is on disk. On startup pending() lists jobs that never
+    finished. Commands carrying a password are not journaled at all (nothing to replay, and the
+    password stays in memory); the file is created with mode 0600."""
+
+    STATES = ("accepted", "running", "succeeded", "failed")
+
+    def __init__(self, path=JOURNAL_PATH, batch_max=JOURNAL_BATCH_MAX, retention=JOB_TTL):
+        self.path = path
+        self.batch_max = batch_max
+        self._queue = queue.Queue()
+        self._cond = threading.Condition()
+        self._appended = 0
+        self._committed = 0
+        self._skipped = set()   # job ids not journaled (they carry a password)
+        self.stats = {"appended": 0, "commits": 0, "max_batch": 0, "errors": 0, "skipped": 0}
+        os.close(os.open(path, os.O_CREAT | os.O_RDWR, 0o600))
+        os.chmod(path, 0o600)   # SQLite gives the -wal/-shm files the same mode
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("""CREATE TABLE IF NOT EXISTS journal (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT, job_id TEXT NOT NULL, state TEXT NOT NULL,
+                at REAL NOT NULL, session TEXT, command TEXT, result TEXT)""")
+            db.execute("CREATE INDEX IF NOT EXISTS journal_job ON journal (job_id)")
+            # Jobs that finished longer than `retention` ago are of no further use.
+            db.execute("""DELETE FROM journal WHERE job_id IN (SELECT job_id FROM journal
+                WHERE state IN ('succeeded', 'failed') AND at < ?)""", (time.time() - retention,))
+            # Rows written before passwords were kept out of the journal.
+            db.execute("""DELETE FROM journal WHERE job_id IN (SELECT job_id FROM journal
+                WHERE command LIKE '%password%')""")
+        self._writer = threading.Thread(target=self._write_loop, name="sap-robot-journal", daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10)
+        # WAL + NORMAL: a commit survives a process crash without an fsync per transaction.
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def append(self, job_id, state, session=None, command=None, result=None):
+        if job_id in self._skipped or (command is not None and _carries_password(command)):
+            with self._cond:
+                self.stats["skipped"] += 1
+                if state in ("succeeded", "failed"):
+                    self._skipped.discard(job_id)
+                else:
+                    self._skipped.add(job_id)
+            return
+        row = (job_id, state, time.time(), session,
+               None if command is None else json.dumps(command, default=str),
+               None if result is None else json.dumps(result, default=str))
+        with self._cond:
+            self._appended += 1
+            self.stats["appended"] += 1
+        self._queue.put(row)
+
+    def sync(self, timeout=JOURNAL_SYNC_TIMEOUT):
+        """Blocks until every entry appended before the call is committed; False on timeout."""
+        with self._cond:
+            target = self._appended
+            return self._cond.wait_for(lambda: self._committed >= target, timeout)
+
+    def _write_loop(self):
+        db = self._connect()
+        while True:
+            rows = [self._queue.get()]
+            # Group commit: everything that queued up during the last commit goes in this one.
+            while len(rows) < self.batch_max:
+                try:
+                    rows.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in rows
+            rows = [row for row in rows if row is not None]
+            try:
+                with db:
+                    db.executemany("INSERT INTO journal (job_id, state, at, session, command, result) "
+                                   "VALUES (?, ?, ?, ?, ?, ?)", rows)
+            except sqlite3.Error as e:
+                self.stats["errors"] += 1
+                print(f"⚠️ Command journal write failed: {e}")
+            with self._cond:
+                self._committed += len(rows)
+                self.stats["commits"] += 1
+                self.stats["max_batch"] = max(self.stats["max_batch"], len(rows))
+                self._cond.notify_all()
+            if stop:
+                db.close()
+                return
+
+    def pending(self):
+        """[{job_id, state, session, command, accepted_at}] of jobs whose last entry is accepted
+        or running, oldest first."""
+        with self._connect() as db:
+            rows = db.execute("""SELECT j.job_id, j.state, a.session, a.command, a.at FROM journal j
+                JOIN (SELECT job_id, MAX(seq) AS seq FROM journal GROUP BY job_id) last
+                  ON last.seq = j.seq
+                JOIN (SELECT job_id, session, command, at, MIN(seq) AS seq FROM journal
+                      WHERE state = 'accepted' GROUP BY job_id) a ON a.job_id = j.job_id
+                WHERE j.state IN ('accepted', 'running') ORDER BY a.seq""").fetchall()
+        return [{"job_id": job_id, "state": state, "session": session, "command": json.loads(command),
+                 "accepted_at": at} for job_id, state, session, command, at in rows if command]
+
+    def close(self):
+        self._queue.put(None)
+        self._writer.join(timeout=JOURNAL_SYNC_TIMEOUT)
+
+    def metrics(self):
+        with self._cond:
+            return dict(self.stats, backlog=self._appended - self._committed, path=self.path)
+
+class JobStore:
+    """Status and result of every submitted command by job id. Finished jobs are kept for
+    `ttl` seconds and at most `max_jobs` of them (oldest evicted first); queued or running
+    jobs are never evicted."""
+
+    def __init__(self, max_jobs=JOB_RETENTION, ttl=JOB_TTL, journal=None):
+        self.max_jobs = max_jobs
+        self.ttl = ttl
+        self.journal = journal
+        self._jobs = collections.OrderedDict()   # job id -> job dict
+        self._done = {}                          # job id -> threading.Event
+        self._callbacks = {}                     # job id -> [fn()] run once on finish
+        self._lock = threading.Lock()
+
+    def create(self, command_data, session, job_id=None):
+        """New queued job; `job_id` is only passed when a journaled job is replayed."""
+        command_json = parse_command(command_data) or {}
+        job_id = job_id or uuid.uuid4().hex[:12]
+        job = {"job_id": job_id, "status": "queued", "action": command_json.get("action"),
+               "session": session, "created_at": time.time(), "started_at": None,
+               "finished_at": None, "result": None}
+        with self._lock:
+            self._evict()
+            self._jobs[job_id] = job
+            self._done[job_id] = threading.Event()
+            self._callbacks[job_id] = []
+        if self.journal is not None:
+            self.journal.append(job_id, "accepted", session=session, command=command_data)
+        return job_id
+
+    def _evict(self):
+        now = time.time()
+        finished = [jid for jid, job in self._jobs.items() if job["finished_at"] is not None]
+        overflow = len(finished) - self.max_jobs
+        for jid in finished:
+            if overflow > 0 or now - self._jobs[jid]["finished_at"] > self.ttl:
+                del self._jobs[jid]
+                del self._done[jid]
+                self._callbacks.pop(jid, None)
+                overflow -= 1
+
+    def start(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job["status"] = "running"
+                job["started_at"] = time.time()
+        if job is not None and self.journal is not None:
+            self.journal.append(job_id, "running")
+
+    def finish(self, job_id, result, failed=False):
+        failed = failed or (isinstance(result, dict) and result.get("status") in ("error", "rejected"))
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job["status"] = "failed" if failed else "succeeded"
+            job["finished_at"] = time.time()
+            job["result"] = result
+            self._done[job_id].set()
+            callbacks, self._callbacks[job_id] = self._callbacks.get(job_id, []), []
+        if self.journal is not None:
+            self.journal.append(job_id, job["status"], result=result)
+        for fn in callbacks:
+            fn()
+
+    def add_done_callback(self, job_id, fn):
+        """Calls fn() (from the worker thread) once the job finishes, or right away if it has.
+        Returns False for unknown jobs."""
+        with self._lock:
+            if job_id not in self._jobs:
+                return False
+            if not self._done[job_id].is_set():
+                self._callbacks[job_id].append(fn)
+                return True
+        fn()
+        return True
+
+    def get(self, job_id, wait=0):
+        """Snapshot of the job (None if unknown or evicted); waits up to `wait` s for it to finish."""
+        with self._lock:
+            done = self._done.get(job_id)
+        if done is None:
+            return None
+        if wait:
+            done.wait(min(float(wait), MAX_WAIT_S))
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def counts(self):
+        with self._lock:
+            counts = collections.Counter(job["status"] for job in self._jobs.values())
+        return dict(counts, retained=sum(counts.values()))
+
+# ▼▼▼ Command Queue (one lane + worker per operator session) ▼▼▼
+COMMAND_QUEUE_SIZE = int(os.environ.get("SAP_ROBOT_QUEUE_SIZE", "20"))
+# Relative moves are meant to repeat ("next, next"): never coalesced, and only deduplicated
+# by explicit keys.
+RELATIVE_ACTIONS = ("next_order", "previous_order")
+
+class CommandQueue:
+    """Bounded command queue with one FIFO lane per operator session. Each lane is drained by its
+    own worker thread, so one browser never runs two actions at once while different operators
+    run in parallel. Identical commands that are still queued or running are coalesced into one
+    (and share its job id), except RELATIVE_ACTIONS, where every request is one more step."""
+
+    def __init__(self, handler, maxsize=COMMAND_QUEUE_SIZE, key_func=None, jobs=None):
+        self.handler = handler
+        self.maxsize = maxsize
+        self.key_func = key_func or (lambda command_data: "default")
+        self.jobs = jobs if jobs is not None else JobStore()
+        self._lanes = {}    # session key -> deque of (coalescing key, job id, command)
+        self._pending = {}  # coalescing key -> job id
+        self._size = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self.stats = {"accepted": 0, "coalesced": 0, "rejected": 0, "processed": 0, "failed": 0}
+
+    @staticmethod
+    def _key(command_data):
+        """Coalescing key, or None for commands that must run every time they are sent."""
+        if (parse_command(command_data) or {}).get("action") in RELATIVE_ACTIONS:
+            return None
+        try:
+            return json.dumps(command_data, sort_keys=True)
+        except (TypeError, ValueError):
+            return repr(command_data)
+
+    def submit(self, command_data, job_id=None):
+        """Returns (outcome, job id): outcome is 'queued', 'coalesced', 'rejected' (queue full)
+        or 'closed' (shutting down); the job id is None for the last two. `job_id` keeps the
+        id of a replayed journal entry."""
+        key = self._key(command_data)
+        session = self.key_func(command_data)
+        with self._lock:
+            if self._closed:
+                return "closed", None
+            if key is not None and key in self._pending:
+                self.stats["coalesced"] += 1
+                return "coalesced", self._pending[key]
+            if self._size >= self.maxsize:
+                self.stats["rejected"] += 1
+                return "rejected", None
+            job_id = self.jobs.create(command_data, session, job_id)
+            key = key or f"job:{job_id}"
+            lane = self._lanes.get(session)
+            if lane is None:
+                lane = self._lanes[session] = collections.deque()
+                threading.Thread(target=self._run, args=(session,),
+                                 name=f"sap-robot-worker[{session}]", daemon=True).start()
+            lane.append((key, job_id, command_data))
+            self._pending[key] = job_id
+            self._size += 1
+            self.stats["accepted"] += 1
+            return "queued", job_id
+
+    def depth(self):
+        return self._size
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def close(self):
+        """Stops accepting commands; queued ones still run."""
+        with self._lock:
+            self._closed = True
+
+    def drain(self, timeout):
+        """Blocks until every queued and running command finished; False on timeout."""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            with self._lock:
+                if not self._pending:
+                    return True
+            time.sleep(0.1)
+        return False
+
+    def metrics(self):
+        with self._lock:
+            return dict(self.stats, queue_depth=self._size, in_flight=len(self._pending),
+                        lanes=len(self._lanes), capacity=self.maxsize, jobs=self.jobs.counts())
+
+    def _run(self, session):
+        while True:
+            with self._lock:
+                lane = self._lanes[session]
+                if not lane:
+                    # Lane drained: retire the worker; the next submit starts a fresh one.
+                    del self._lanes[session]
+                    return
+                key, job_id, command_data = lane.popleft()
+                self._size -= 1
+            self.jobs.start(job_id)
+            try:
+                result = self.handler(session, command_data)
+                self.stats["processed"] += 1
+                self.jobs.finish(job_id, result)
+            except Exception as e:
+                self.stats["failed"] += 1
+                print(f"!! Worker error: {e}")
+                traceback.print_exc()
+                self.jobs.finish(job_id, {"status": "error", "message": str(e)}, failed=True)
+            finally:
+                with self._lock:
+                    self._pending.pop(key, None)
+
+def odata_dispatch(command_data):
+    """Runs a command on the OData backend when enabled and able to; None means: use a browser."""
+    if odata_backend is None:
+        return None
+    command = parse_command(command_data)
+    if not command:
+        return None
+    try:
+        validate_command(command)
+    except CommandError:
+        return None   # the dispatcher answers with the structured rejection
+    if command.get("action") == "batch":
+        params = command.get("params") or {}
+        return odata_backend.execute_batch(params.get("commands") or [], params.get("on_error", "stop"))
+    return odata_backend.execute(command)
+
+def run_in_session(session, command_data):
+    result = odata_dispatch(command_data)
+    if result is not None:
+        return result
+    with robot_pool.session(session) as robot:
+        return dispatch_action(command_data, robot)
+
+# ▼▼▼ Worker Farm (one process + robot pool per shard of operators) ▼▼▼
+FARM_WORKERS = int(os.environ.get("SAP_ROBOT_WORKERS", "0"))   # 0 = browsers run in this process
+FARM_POOL_SIZE = int(os.environ.get("SAP_ROBOT_WORKER_POOL_SIZE", "0")) or max(
+    1, -(-POOL_SIZE // max(1, FARM_WORKERS)))
+FARM_RESTART_DELAY = float(os.environ.get("SAP_ROBOT_WORKER_RESTART_DELAY", "2"))
+FARM_POLL_S = 0.5
+_ENVIRON_LOCK = threading.Lock()
+
+@contextmanager
+def _child_environment(overrides):
+    """os.environ with `overrides` while a spawned child starts (it re-reads the config)."""
+    with _ENVIRON_LOCK:
+        saved = {name: os.environ.get(name) for name in overrides}
+        os.environ.update(overrides)
+        try:
+            yield
+        finally:
+            for name, value in saved.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
+def farm_worker(index, inbox, outbox):
+    """Worker process main: owns a SapRobotPool and runs every command it is sent on a thread
+    of its own. The supervisor keeps one command per operator in flight, so an operator's
+    commands still run in order on one browser."""
+    print(f"🏭 Worker {index} (pid {os.getpid()}) starting...")
+    robot_pool.prewarm()
+    if not robot_pool.wait_warm():
+        print(f"⚠️ Worker {index}: no robot could be warmed, starting browsers on demand.")
+    outbox.put(("ready", os.getpid()))
+
+    def handle(token, session, command_data):
+        try:
+            result = run_in_session(session, command_data)
+        except Exception as e:
+            traceback.print_exc()
+            result = {"status": "error", "message": str(e)}
+        outbox.put((token, result))
+
+    while True:
+        message = inbox.get()
+        if message is None:
+            break
+        threading.Thread(target=handle, args=message, name=f"sap-robot-farm[{message[1]}]", daemon=True).start()
+    robot_pool.quit_all()
+
+class RobotFarm:
+    """Supervisor of `workers` processes, each with its own SapRobotPool and Chromes. Operators
+    are sharded by a stable hash of their session key (personnel number or chat id), so an
+    operator always lands on the same process and browser. A worker that dies is started again;
+    the commands it had in flight fail instead of hanging."""
+
+    def __init__(self, workers=FARM_WORKERS, pool_size=FARM_POOL_SIZE, restart_delay=FARM_RESTART_DELAY):
+        self.size = max(1, workers)
+        self.pool_size = pool_size
+        self.restart_delay = restart_delay
+        # spawn, not fork: the supervisor has threads, and Chrome must not be inherited.
+        self._ctx = multiprocessing.get_context("spawn")
+        self._workers = [None] * self.size
+        self._lock = threading.Lock()
+        self._stopping = False
+
+    def shard(self, session):
+        return zlib.crc32(str(session).encode()) % self.size
+
+    def start(self):
+        for index in range(self.size):
+            self._spawn(index, restarts=0)
+
+    def _spawn(self, index, restarts):
+        inbox, outbox = self._ctx.Queue(), self._ctx.Queue()
+        process = self._ctx.Process(target=farm_worker, args=(index, inbox, outbox),
+                                    name=f"sap-robot-worker-{index}", daemon=True)
+        with _child_environment({"SAP_ROBOT_WORKERS": "0", "SAP_ROBOT_JOURNAL": "",
+                                 "SAP_ROBOT_POOL_SIZE": str(self.pool_size), "SAP_ROBOT_WORKER_ID": str(index)}):
+            process.start()
+        worker = {"index": index, "process": process, "inbox": inbox, "outbox": outbox,
+                  "waiting": {}, "ready": False, "dead": False, "restarts": restarts,
+                  "processed": 0, "started_at": time.time()}
+        with self._lock:
+            self._workers[index] = worker
+        threading.Thread(target=self._read, args=(worker,), name=f"sap-robot-farm-reader-{index}",
+                         daemon=True).start()
+
+    def _read(self, worker):
+        while True:
+            try:
+                token, result = worker["outbox"].get(timeout=FARM_POLL_S)
+            except queue.Empty:
+                if not worker["process"].is_alive():
+                    self._crashed(worker)
+                    return
+                continue
+            except (EOFError, OSError):
+                self._crashed(worker)
+                return
+            if token == "ready":
+                worker["ready"] = True
+                print(f"🏭 Worker {worker['index']} ready (pid {result}).")
+                STARTUP.mark("first_worker_ready")
+                continue
+            with self._lock:
+                waiter = worker["waiting"].pop(token, None)
+                worker["processed"] += 1
+            if waiter is not None:
+                waiter["result"] = result
+                waiter["done"].set()
+
+    def _crashed(self, worker):
+        with self._lock:
+            worker["dead"] = True
+            waiting, worker["waiting"] = worker["waiting"], {}
+        if self._stopping:
+            return
+        print(f"⚠️ Worker {worker['index']} died (exit code {worker['process'].exitcode}), restarting...")
+        for waiter in waiting.values():
+            waiter["result"] = {"status": "error", "message": f"Worker {worker['index']} crashed while "
+                                                               "running the command; check SAP before retrying"}
+            waiter["done"].set()
+        time.sleep(self.restart_delay)
+        if not self._stopping:
+            self._spawn(worker["index"], restarts=worker["restarts"] + 1)
+
+    def run(self, session, command_data):
+        """CommandQueue handler: runs the command on the operator's worker and returns its result."""
+        token = uuid.uuid4().hex
+        waiter = {"done": threading.Event(), "result": None}
+        with self._lock:
+            worker = self._workers[self.shard(session)]
+            if worker is None or worker["dead"]:
+                return {"status": "error", "message": "Robot worker is restarting, retry shortly"}
+            worker["waiting"][token] = waiter
+        worker["inbox"].put((token, session, command_data))
+        waiter["done"].wait()
+        return waiter["result"]
+
+    def stop(self, timeout=10):
+        self._stopping = True
+        with self._lock:
+            workers = [w for w in self._workers if w is not None]
+        for worker in workers:
+            try:
+                worker["inbox"].put(None)
+            except (OSError, ValueError):
+                pass
+        for worker in workers:
+            worker["process"].join(timeout)
+            if worker["process"].is_alive():
+                worker["process"].terminate()
+
+    def status(self):
+        with self._lock:
+            return {"size": self.size, "pool_size": self.pool_size, "workers": [
+                {"index": w["index"], "pid": w["process"].pid, "alive": not w["dead"], "ready": w["ready"],
+                 "restarts": w["restarts"], "in_flight": len(w["waiting"]), "processed": w["processed"]}
+                for w in self._workers if w is not None]}
+
+robot_farm = RobotFarm() if FARM_WORKERS > 0 else None
+
+command_journal = CommandJournal() if JOURNAL_PATH else None
+command_queue = CommandQueue(robot_farm.run if robot_farm else run_in_session, key_func=session_key,
+                             jobs=JobStore(journal=command_journal))
+
+def replay_journal():
+    """Queues again, under their old job ids, the commands that were accepted but had not
+    finished when the process stopped. Interrupted JOURNAL_UNSAFE_REPLAY actions are marked
+    failed instead: they may already be booked. So are commands older than
+    JOURNAL_REPLAY_MAX_AGE: an operator would not expect them to run now."""
+    if command_journal is None:
+        return {"replayed": 0, "abandoned": 0, "expired": 0}
+    replayed = abandoned = expired = 0
+    jobs = command_queue.jobs
+    for entry in command_journal.pending():
+        command = parse_command(entry["command"]) or {}
+        age = time.time() - (entry["accepted_at"] or 0)
+        if age > JOURNAL_REPLAY_MAX_AGE:
+            jobs.finish(jobs.create(entry["command"], entry["session"], entry["job_id"]), {
+                "status": "error", "message": f"Accepted {age / 60:.0f} min before the restart and not "
+                                              "run any more: send it again if it is still wanted"})
+            expired += 1
+            continue
+        if entry["state"] == "running" and command.get("action") in JOURNAL_UNSAFE_REPLAY:
+            jobs.finish(jobs.create(entry["command"], entry["session"], entry["job_id"]), {
+                "status": "error", "message": "Interrupted by a restart and not run again: "
+                                              "check in SAP whether it was booked"})
+            abandoned += 1
+            continue
+        outcome, _ = command_queue.submit(entry["command"], job_id=entry["job_id"])
+        replayed += outcome in ("queued", "coalesced")
+    if replayed or abandoned or expired:
+        print(f"📒 Journal replay: {replayed} command(s) queued again, {abandoned} left for manual check, "
+              f"{expired} expired.")
+    return {"replayed": replayed, "abandoned": abandoned, "expired": expired}
+
+# ▼▼▼ Idempotency (Telegram/n8n retries must not book twice) ▼▼▼
+DEDUPE_WINDOW_S = float(os.environ.get("SAP_ROBOT_DEDUPE_WINDOW", "30"))
+IDEMPOTENCY_KEY_TTL = float(os.environ.get("SAP_ROBOT_IDEMPOTENCY_TTL", "3600"))
+IDEMPOTENCY_MAX_KEYS = int(os.environ.get("SAP_ROBOT_IDEMPOTENCY_KEYS", "2000"))
+
+def idempotency_key(command_data, explicit=None):
+    """(key, explicit?) for a command, or (None, False) when it must not be deduplicated.
+    Explicit: Idempotency-Key header, or chat_id + message_id from the Telegram update.
+    Otherwise a hash of session + action + params."""
+    if explicit:
+        return f"key:{explicit}", True
+    if isinstance(command_data, dict) and command_data.get("message_id") is not None:
+        return f"msg:{command_data.get('chat_id', '')}:{command_data['message_id']}", True
+    command = parse_command(command_data) or {}
+    if command.get("action") in RELATIVE_ACTIONS:
+        return None, False
+    content = json.dumps({"session": session_key(command_data), "action": command.get("action"),
+                          "params": command.get("params") or {}}, sort_keys=True, default=str)
+    return f"hash:{hashlib.sha1(content.encode()).hexdigest()}", False
+
+class IdempotencyStore:
+    """Maps idempotency keys to the job that first ran them. Content-hash keys live for
+    `window` seconds, explicit keys for `key_ttl`; at most `max_keys` are kept (oldest dropped).
+    A content-hash duplicate of a failed job may run again; an explicit one never does.
+    Each entry keeps the finished job, so a key outlives the job's eviction from JobStore."""
+
+    def __init__(self, jobs, window=DEDUPE_WINDOW_S, key_ttl=IDEMPOTENCY_KEY_TTL, max_keys=IDEMPOTENCY_MAX_KEYS):
+        self.jobs = jobs
+        self.window = window
+        self.key_ttl = key_ttl
+        self.max_keys = max_keys
+        self._keys = collections.OrderedDict()   # key -> {job_id, expires, explicit, job}
+        self._lock = threading.Lock()
+        self.duplicates = 0
+
+    def _expire(self, now):
+        for key in [k for k, entry in self._keys.items() if entry["expires"] <= now]:
+            del self._keys[key]
+        while len(self._keys) > self.max_keys:
+            self._keys.popitem(last=False)
+
+    def original(self, key):
+        """Snapshot of the first run of `key` if its result still stands, else None."""
+        if key is None:
+            return None
+        with self._lock:
+            self._expire(time.time())
+            entry = self._keys.get(key)
+        if entry is None:
+            return None
+        job = self.jobs.get(entry["job_id"]) or entry["job"]
+        if job is None or (job["status"] == "failed" and not entry["explicit"]):
+            return None
+        with self._lock:
+            self.duplicates += 1
+        return job
+
+    def remember(self, key, job_id, explicit):
+        if key is None or job_id is None:
+            return
+        entry = {"job_id": job_id, "expires": time.time() + (self.key_ttl if explicit else self.window),
+                 "explicit": explicit, "job": None}
+        with self._lock:
+            self._keys[key] = entry
+            self._keys.move_to_end(key)
+            self._expire(time.time())
+
+        def _settle():
+            entry["job"] = self.jobs.get(job_id)
+        self.jobs.add_done_callback(job_id, _settle)
+
+    def stats(self):
+        with self._lock:
+            return {"keys": len(self._keys), "duplicates": self.duplicates,
+                    "window_s": self.window, "key_ttl_s": self.key_ttl}
+
+idempotency = IdempotencyStore(command_queue.jobs)
+
+# ▼▼▼ HTTP API (aiohttp: intake never blocks on the browser) ▼▼▼
+SERVER_HOST = os.environ.get("SAP_ROBOT_HOST", "localhost")
+SERVER_PORT = int(os.environ.get("SAP_ROBOT_PORT", "5000"))
+SHUTDOWN_DRAIN_S = float(os.environ.get("SAP_ROBOT_SHUTDOWN_DRAIN", "60"))
+
+def _wait_param(request):
+    try:
+        return float(request.query.get("wait") or 0)
+    except ValueError:
+        return 0
+
+async def _read_json(request):
+    raw_data = await request.read()
+    return json.loads(raw_data.decode('utf-8'))
+
+async def wait_for_job(job_id, wait):
+    """Awaits the job without tying up a thread: the worker resolves a future on finish."""
+    loop = asyncio.get_running_loop()
+    finished = loop.create_future()
+
+    def _on_done():
+        loop.call_soon_threadsafe(lambda: finished.done() or finished.set_result(None))
+
+    if command_queue.jobs.add_done_callback(job_id, _on_done) and wait:
+        try:
+            await asyncio.wait_for(finished, timeout=min(wait, MAX_WAIT_S))
+        except asyncio.TimeoutError:
+            pass
+    return command_queue.jobs.get(job_id)
+
+def _learn_on_success(job_id, transcript, command_data):
+    def _done():
+        job = command_queue.jobs.get(job_id)
+        if job is not None and job["status"] == "succeeded":
+            LLM_INTENT_CACHE.put(transcript, parse_command(command_data))
+    command_queue.jobs.add_done_callback(job_id, _done)
+
+schema_rejections = collections.Counter()
+
+async def submit_response(request, command_data, learn_from=None, **extra):
+    """Validates and queues the command; with ?wait=<s> answers with the finished job
+    (202 if still running). Schema failures are answered with 400 without queueing."""
+    try:
+        load_command(command_data)
+    except CommandError as e:
+        schema_rejections[e.action or "?"] += 1
+        return web.json_response(e.as_response(), status=400)
+    key, explicit = idempotency_key(command_data, request.headers.get("Idempotency-Key"))
+    original = idempotency.original(key)
+    if original is not None:
+        outcome, job_id = "duplicate", original["job_id"]
+    else:
+        outcome, job_id = command_queue.submit(command_data)
+        idempotency.remember(key, job_id, explicit)
+        if outcome == "queued" and command_journal is not None:
+            # Acknowledge only once "accepted" is on disk; concurrent requests share one commit.
+            await asyncio.get_running_loop().run_in_executor(None, command_journal.sync)
+    if learn_from and outcome == "queued":
+        _learn_on_success(job_id, learn_from, command_data)
+    if outcome == "rejected":
+        return web.json_response({"status": "error", "message": "Command queue full, retry later",
+                                  "queue_depth": command_queue.depth()}, status=429)
+    if outcome == "closed":
+        return web.json_response({"status": "error", "message": "Server is shutting down"}, status=503)
+    wait = _wait_param(request)
+    if wait:
+        job = await wait_for_job(job_id, wait) or original
+        return web.json_response(dict(job, queue_depth=command_queue.depth(), duplicate=outcome == "duplicate"),
+                                 status=200 if job["finished_at"] else 202)
+    if outcome == "duplicate":
+        # Same answer the first request got (or gets), without running it again.
+        job = command_queue.jobs.get(job_id) or original
+        return web.json_response(dict({"status": "duplicate", "job_id": job_id, "job_status": job["status"],
+                                       "result": job["result"], "queue_depth": command_queue.depth()}, **extra))
+    return web.json_response(dict({"status": "received" if outcome == "queued" else "coalesced",
+                                   "job_id": job_id, "queue_depth": command_queue.depth()}, **extra))
+
+async def execute_command(request):
+    try:
+        command_data = await _read_json(request)
+    except Exception as e:
+        return web.json_response({"status": "error", "message": str(e)}, status=500)
+
+    if isinstance(command_data, dict) and "text" in command_data and not (
+            "action" in command_data or "output" in command_data):
+        # Raw transcript: fast path + LLM cache; the caller sends misses to the LLM.
+        command, _ = resolve_intent(command_data["text"])
+        if command is None:
+            return web.json_response({"status": "needs_llm", "text": command_data["text"]}, status=422)
+        for field in ("chat_id", "message_id"):
+            if command_data.get(field) is not None:
+                command[field] = command_data[field]
+        command_data = command
+        transcript = None
+    else:
+        # LLM answer that carries its transcript: cache it once it executed successfully.
+        transcript = command_data.get("text") if isinstance(command_data, dict) else None
+    return await submit_response(request, command_data, learn_from=transcript)
+
+async def intent(request):
+    """Intent lookup only (no execution): {"matched", "command", "source", "latency_ms"}."""
+    try:
+        body = await _read_json(request)
+    except Exception as e:
+        return web.json_response({"status": "error", "message": str(e)}, status=500)
+    t0 = time.perf_counter()
+    command, source = resolve_intent(body.get("text", "") if isinstance(body, dict) else "")
+    return web.json_response({"matched": command is not None, "command": command, "source": source,
+                              "latency_ms": round((time.perf_counter() - t0) * 1000, 3)})
+
+async def correct(request):
+    """Transcript correction against the robot vocabulary (replaces the n8n lev() node):
+    {"text", "original", "tokens", "latency_ms"}."""
+    try:
+        body = await _read_json(request)
+    except Exception as e:
+        return web.json_response({"status": "error", "message": str(e)}, status=500)
+    original = body.get("text", "") if isinstance(body, dict) else ""
+    t0 = time.perf_counter()
+    result = VOCABULARY_MATCHER.correct(original)
+    return web.json_response(dict(result, original=original,
+                                  latency_ms=round((time.perf_counter() - t0) * 1000, 3)))
+
+async def job_status(request):
+    job_id = request.match_info["job_id"]
+    job = await wait_for_job(job_id, _wait_param(request))
+    if job is None:
+        return web.json_response({"status": "error", "message": f"Unknown or expired job: {job_id}"}, status=404)
+    return web.json_response(job, status=200 if job["finished_at"] else 202)
+
+async def execute_batch(request):
+    try:
+        body = await _read_json(request)
+    except Exception as e:
+        return web.json_response({"status": "error", "message": str(e)}, status=500)
+
+    if not isinstance(body, dict):
+        body = {}
+    commands = body.get("commands")
+    on_error = body.get("on_error", "stop")
+    command_data = {"action": "batch", "params": {"commands": commands, "on_error": on_error}}
+    if body.get("chat_id"):
+        command_data["chat_id"] = body["chat_id"]
+    return await submit_response(request, command_data, steps=len(commands) if isinstance(commands, list) else 0)
+
+async def metrics(request):
+    return web.json_response(dict(command_queue.metrics(),
+                                  pool=robot_farm.status() if robot_farm else robot_pool.status(),
+                                  llm_cache=LLM_INTENT_CACHE.stats(), schema_rejections=dict(schema_rejections),
+                                  idempotency=idempotency.stats(),
+                                  journal=command_journal.metrics() if command_journal else None,
+                                  backend=dict(odata_backend.stats, mode=BACKEND_MODE) if odata_backend else
+                                  {"mode": BACKEND_MODE}, startup=STARTUP.as_dict()))
+
+async def schema(request):
+    """Accepted actions with their parameter rules, plus prompt actions the robot lacks."""
+    def describe(required, rule):
+        info = {"required": required}
+        if rule is list:
+            info["type"] = "list"
+        elif isinstance(rule, tuple):
+            info["allowed"] = list(rule)
+        elif rule is not None:
+            info["pattern"] = rule.pattern
+        return info
+
+    return web.json_response({
+        "actions": {action: {name: describe(*spec) for name, spec in params.items()}
+                    for action, params in COMMAND_SCHEMAS.items()},
+        "prompt_actions": PROMPT_ACTIONS,
+        "unsupported_prompt_actions": UNSUPPORTED_PROMPT_ACTIONS,
+    })
+
+async def healthz(request):
+    """Readiness: accepting commands and a browser is warm (or none is still starting).
+    With a worker farm: every worker process is up and has warmed its first robot (or given up)."""
+    accepting = not command_queue.closed
+    if robot_farm is not None:
+        health = robot_farm.status()
+        ready = accepting and all(w["alive"] and w["ready"] for w in health["workers"])
+        return web.json_response(dict(health, ready=ready, accepting=accepting,
+                                      queue_depth=command_queue.depth()), status=200 if ready else 503)
+    health = await asyncio.get_running_loop().run_in_executor(None, robot_pool.health)
+    warm = health["spares_alive"] + sum(1 for state in health["sessions"].values() if state != "down")
+    ready = accepting and (warm > 0 or health["warming"] == 0)
+    return web.json_response(dict(health, ready=ready, accepting=accepting,
+                                  queue_depth=command_queue.depth()), status=200 if ready else 503)
+
+async def _graceful_shutdown(app):
+    print("🛑 Shutting down: draining queued commands...")
+    command_queue.close()
+    loop = asyncio.get_running_loop()
+    if not await loop.run_in_executor(None, command_queue.drain, SHUTDOWN_DRAIN_S):
+        print(f"⚠️ Queue not drained after {SHUTDOWN_DRAIN_S}s, quitting anyway.")
+    await loop.run_in_executor(None, robot_farm.stop if robot_farm else robot_pool.quit_all)
+    print("✅ Browsers closed.")
+    if command_journal is not None:
+        command_journal.close()
+
+def build_app():
+    app = web.Application()
+    app.router.add_post('/execute', execute_command)
+    app.router.add_post('/execute_batch', execute_batch)
+    app.router.add_post('/intent', intent)
+    app.router.add_post('/correct', correct)
+    app.router.add_get('/jobs/{job_id}', job_status)
+    app.router.add_get('/metrics', metrics)
+    app.router.add_get('/schema', schema)
+    app.router.add_get('/healthz', healthz)
+    app.on_shutdown.append(_graceful_shutdown)
+    return app
+
+
+async def _serve_on_running_loop(host, port):
+    """Notebook path (ipykernel already runs a loop, so run_app cannot): the site runs as a
+    task on that loop and the runner is returned; `await runner.cleanup()` stops it."""
+    runner = web.AppRunner(build_app())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    STARTUP.mark("listening")
+    print(f"======== Running on http://{host}:{port} (notebook event loop) ========")
+    return runner
+
+def serve(host=SERVER_HOST, port=SERVER_PORT, prewarm=True):
+    """Boots the server. Browsers warm up in the background (selenium is imported there), so
+    the port is open while Chrome still starts; "ready" waits for both unless prewarm=False
+    or the OData backend takes the confirmations. Inside a running event loop (a notebook)
+    it returns at once with a task that starts the server on that loop."""
+    STARTUP.mark("imports")
+    if robot_farm is not None:
+        STARTUP.ready_after = ("listening", "first_worker_ready")
+        robot_farm.start()
+    elif prewarm:
+        if odata_backend is None:
+            STARTUP.ready_after = ("listening", "first_robot_warm")
+        robot_pool.prewarm()
+    replay_journal()
+
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    if loop is not None:
+        return loop.create_task(_serve_on_running_loop(host, port))
+
+    def _announce(message):
+        # run_app prints its banner once the sockets accept connections.
+        STARTUP.mark("listening")
+        print(message)
+
+    web.run_app(build_app(), host=host, port=port, print=_announce)
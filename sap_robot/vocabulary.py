@@ -0,0 +1,177 @@
+##################################################################
+# sap_robot.vocabulary: Transcript Correction (indexed fuzzy vocabulary)
+##################################################################
+import collections
+import random
+import re
+import string
+import time
+
+from .common import UI_TEXTS
+from .intents import INTENT_APP_ALIASES, INTENT_REASONS, normalize_transcript
+
+# Spoken command words the vocabulary needs on top of UI_TEXTS, app aliases and reasons.
+VOCAB_COMMAND_WORDS = (
+    "oeffne", "open", "naechster", "naechste", "next", "vorheriger", "vorherige", "zurueck", "previous",
+    "auftrag", "order", "vorgang", "operation", "personalnummer", "werk", "plant",
+    "starte", "beende", "start", "end", "ruesten", "abruesten", "bearbeitung", "verarbeitung",
+    "setup", "processing", "teardown", "buche", "mengen", "gutmenge", "ausschuss", "nacharbeit",
+    "yield", "scrap", "rework", "grund", "reason", "pausiere", "fortsetzen", "logge", "login",
+)
+
+def transcript_vocabulary():
+    """Single words from app names (both languages), phases/actions, app aliases, reason codes
+    and command words, normalized like the transcripts they are matched against."""
+    phrases = list(VOCAB_COMMAND_WORDS)
+    for key, texts in UI_TEXTS.items():
+        if key.startswith(("app:", "phase:", "action:")):
+            phrases.extend(t for lang_texts in texts.values() for t in lang_texts)
+    phrases.extend(alias for aliases in INTENT_APP_ALIASES.values() for alias in aliases)
+    phrases.extend(reason for reason, _ in INTENT_REASONS)
+    return sorted({w for p in phrases for w in normalize_transcript(p).split() if len(w) >= 3})
+
+def levenshtein(a, b, max_dist=None):
+    """Edit distance on two rows. With max_dist, stops as soon as every cell of a row exceeds
+    it and returns max_dist + 1."""
+    if max_dist is not None and abs(len(a) - len(b)) > max_dist:
+        return max_dist + 1
+    if len(a) < len(b):
+        a, b = b, a
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        if max_dist is not None and min(cur) > max_dist:
+            return max_dist + 1
+        prev = cur
+    return prev[-1]
+
+def levenshtein_matrix(a, b):
+    """Port of lev() from the n8n "Code in JavaScript" node (full m x n matrix); benchmark baseline."""
+    m, n = len(a), len(b)
+    dp = [[0] * (n + 1) for _ in range(m + 1)]
+    for i in range(m + 1):
+        dp[i][0] = i
+    for j in range(n + 1):
+        dp[0][j] = j
+    for i in range(1, m + 1):
+        for j in range(1, n + 1):
+            dp[i][j] = min(dp[i - 1][j] + 1, dp[i][j - 1] + 1,
+                           dp[i - 1][j - 1] + (0 if a[i - 1] == b[j - 1] else 1))
+    return dp[m][n]
+
+class NGramIndex:
+    """Inverted index from padded character bigrams to terms. An edit touches at most two
+    bigrams, so a term within k edits of the query shares at least len(bigrams) - 2k of them;
+    only terms passing that count filter get a (bounded) Levenshtein."""
+
+    def __init__(self, terms=()):
+        self.terms = sorted(set(terms))
+        self._postings = collections.defaultdict(list)
+        for i, term in enumerate(self.terms):
+            for gram in self.grams(term):
+                self._postings[gram].append(i)
+
+    @staticmethod
+    def grams(word):
+        padded = f"^{word}$"
+        return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+    def search(self, word, tolerance):
+        """[(distance, term)] within tolerance, closest first."""
+        grams = self.grams(word)
+        counts = collections.Counter()
+        for gram in grams:
+            counts.update(self._postings.get(gram, ()))
+        needed = len(grams) - 2 * tolerance
+        found = []
+        for i, shared in counts.items():
+            if shared >= needed:
+                d = levenshtein(word, self.terms[i], tolerance)
+                if d <= tolerance:
+                    found.append((d, self.terms[i]))
+        return sorted(found)
+
+class VocabularyMatcher:
+    """Corrects transcript tokens against a known vocabulary. Numbers and short words pass
+    through untouched; everything else snaps to the closest vocabulary word within an edit
+    budget that grows with the word length."""
+
+    def __init__(self, terms=None):
+        self.terms = set(terms if terms is not None else transcript_vocabulary())
+        self._index = NGramIndex(self.terms)
+
+    @staticmethod
+    def tolerance(word):
+        if len(word) <= 3:
+            return 0
+        if len(word) <= 5:
+            return 1
+        return 2 if len(word) <= 9 else 3
+
+    def match(self, word):
+        """(term, distance) of the best match, or (None, None)."""
+        if word in self.terms:
+            return word, 0
+        tol = self.tolerance(word)
+        hits = self._index.search(word, tol) if tol else []
+        if not hits:
+            return None, None
+        return hits[0][1], hits[0][0]
+
+    def correct(self, text):
+        """{"text": corrected, "tokens": [{"token", "match", "distance", "confidence"}]}.
+        Confidence is 1 - distance / longer length; tokens left unchanged report None."""
+        tokens, words = [], []
+        for token in normalize_transcript(text).split():
+            term, dist = (None, None) if re.search(r"\d", token) else self.match(token)
+            confidence = None
+            if term is not None:
+                confidence = round(1 - dist / max(len(token), len(term)), 3)
+            tokens.append({"token": token, "match": term, "distance": dist, "confidence": confidence})
+            words.append(term or token)
+        return {"text": " ".join(words), "tokens": tokens}
+
+VOCABULARY_MATCHER = VocabularyMatcher()
+
+def benchmark_vocabulary_matcher(size=10000, queries=50, seed=7):
+    """Indexed matcher vs. the n8n node's approach (full-matrix lev against every term) on a
+    synthetic vocabulary of `size` words plus the real one, queried with 1-2 typos."""
+    rng = random.Random(seed)
+    real = transcript_vocabulary()
+    terms = set(real)
+    while len(terms) < size:
+        terms.add("".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 14))))
+    terms = sorted(terms)
+
+    def typo(word):
+        chars = list(word)
+        for _ in range(rng.randint(1, 2)):
+            i = rng.randrange(len(chars))
+            chars[i] = rng.choice(string.ascii_lowercase)
+        return "".join(chars)
+
+    samples = [typo(rng.choice([w for w in real if len(w) >= 6])) for _ in range(queries)]
+
+    t0 = time.perf_counter()
+    matcher = VocabularyMatcher(terms)
+    build_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    indexed = [matcher.match(w) for w in samples]
+    indexed_ms = (time.perf_counter() - t0) / queries * 1000
+
+    t0 = time.perf_counter()
+    baseline = [min((levenshtein_matrix(w, t), t) for t in terms) for w in samples]
+    baseline_ms = (time.perf_counter() - t0) / queries * 1000
+
+    # Same answer whenever the exhaustive best lies inside the matcher's edit budget.
+    agree = sum(1 for w, (term, d), (bd, _) in zip(samples, indexed, baseline)
+                if (d == bd if bd <= matcher.tolerance(w) else term is None))
+    report = {"vocabulary": len(terms), "queries": queries, "build_s": round(build_s, 2),
+              "indexed_ms_per_query": round(indexed_ms, 2), "matrix_ms_per_query": round(baseline_ms, 2),
+              "speedup": round(baseline_ms / indexed_ms, 1) if indexed_ms else None,
+              "agreement": round(agree / queries, 3)}
+    print(f"📊 Vocabulary matcher: {report}")
+    return report
@@ -0,0 +1,74 @@
+import pytest
+
+from sap_robot.intents import LlmIntentCache
+
+QTY = {"action": "qty_confirmation",
+       "params": {"order_id": "4711", "yield_qty": "20", "scrap_qty": "0", "rework_qty": "0"}}
+
+
+def make_cache(tmp_path):
+    return LlmIntentCache(path=str(tmp_path / "llm.json"), version="test")
+
+
+def test_spoken_numbers_are_slotted(tmp_path):
+    cache = make_cache(tmp_path)
+    command = {"action": "qty_confirmation", "params": {"order_id": "4711", "yield_qty": "20"}}
+    assert cache.put("Gutmenge 20 Auftrag 4711", command)
+    hit = cache.get("Gutmenge 35 Auftrag 4712")
+    assert hit["params"] == {"order_id": "4712", "yield_qty": "35"}
+
+
+def test_unspoken_default_stays_literal(tmp_path):
+    cache = make_cache(tmp_path)
+    command = {"action": "qty_confirmation",
+               "params": {"order_id": "4711", "yield_qty": "20", "rework_qty": "0"}}
+    assert cache.put("Gutmenge 20 Auftrag 4711", command)
+    assert cache.get("Gutmenge 35 Auftrag 4711")["params"]["rework_qty"] == "0"
+
+
+def test_number_in_two_params_is_not_cached(tmp_path):
+    cache = make_cache(tmp_path)
+    # Spoken scrap "0" equals the LLM's default rework "0": the slot would bind both.
+    assert not cache.put("Gutmenge 20 Ausschuss 0 Auftrag 4711", QTY)
+    assert cache.get("Gutmenge 20 Ausschuss 5 Auftrag 4711") is None
+
+
+def test_non_string_number_is_not_cached(tmp_path):
+    cache = make_cache(tmp_path)
+    command = {"action": "qty_confirmation", "params": {"order_id": "4711", "yield_qty": 20}}
+    assert not cache.put("Gutmenge 20 Auftrag 4711", command)
+    assert cache.get("Gutmenge 35 Auftrag 4711") is None
+
+
+def test_unslotted_spoken_number_is_not_cached(tmp_path):
+    cache = make_cache(tmp_path)
+    # "Vorgang 10" came back as "0010": the template would pin every hit to operation 0010.
+    command = {"action": "qty_confirmation",
+               "params": {"order_id": "4711", "operation_filter": "0010", "yield_qty": "5"}}
+    assert not cache.put("Mengen buchen Auftrag 4711 Vorgang 10 Gutmenge 5", command)
+    assert cache.get("Mengen buchen Auftrag 4712 Vorgang 20 Gutmenge 7") is None
+
+
+def test_repeated_number_is_not_cached(tmp_path):
+    cache = make_cache(tmp_path)
+    command = {"action": "qty_confirmation", "params": {"order_id": "20", "yield_qty": "20"}}
+    assert not cache.put("Auftrag 20 Gutmenge 20", command)
+
+
+def test_fast_path_answers_pass_the_command_schema(monkeypatch):
+    pytest.importorskip("aiohttp")
+    monkeypatch.setenv("SAP_ROBOT_JOURNAL", "")   # no journal file from importing the server
+    from sap_robot.intents import INTENT_BENCH_SAMPLES, parse_intent
+    from sap_robot.server import validate_command
+
+    for text, _ in INTENT_BENCH_SAMPLES:
+        command = parse_intent(text)
+        if command is not None:
+            validate_command(command)
+
+
+def test_order_action_without_order_number_goes_to_the_llm():
+    from sap_robot.intents import parse_intent
+
+    assert parse_intent("Gutmenge 20") is None
+    assert parse_intent("Gutmenge 20 Auftrag 4711")["params"]["order_id"] == "4711"
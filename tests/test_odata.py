@@ -0,0 +1,64 @@
+import pytest
+
+pytest.importorskip("requests")
+
+from sap_robot.odata import MockODataServer, ODataExecutor
+
+
+def qty(order_id="1000001", yield_qty="5"):
+    return {"action": "qty_confirmation",
+            "params": {"order_id": order_id, "operation_filter": "0010", "yield_qty": yield_qty,
+                       "scrap_qty": "0", "rework_qty": "0", "reason": ""}}
+
+
+@pytest.fixture
+def server():
+    server = MockODataServer(unknown_orders={"9999999"}).start()
+    yield server
+    server.stop()
+
+
+def make_executor(url):
+    return ODataExecutor(url, username="", password="", timeout=5)
+
+
+def test_execute_posts_confirmation(server):
+    result = make_executor(server.url).execute(qty())
+    assert result["status"] == "success"
+    assert result["confirmation"] == {"ConfirmationGroup": "1", "ConfirmationCount": "1"}
+    assert server.created[0]["OrderID"] == "1000001"
+
+
+def test_business_error_is_reported_not_retried_in_browser(server):
+    executor = make_executor(server.url)
+    result = executor.execute(qty(order_id="9999999"))
+    assert result["status"] == "error"
+    assert "does not exist" in result["message"]
+    assert executor.stats["fallbacks"] == 0
+    assert not server.created
+
+
+def test_atomic_batch_failure_books_nothing(server):
+    result = make_executor(server.url).execute_batch([qty(), qty(order_id="9999999"), qty()])
+    assert result["status"] == "error"
+    assert not any(step["ok"] for step in result["steps"])
+    assert not server.created
+
+
+def test_connection_refused_falls_back_to_browser():
+    server = MockODataServer()
+    url = server.url
+    server.httpd.server_close()   # never served: the port is closed again
+    executor = make_executor(url)
+    assert executor.execute(qty()) is None
+    assert executor.stats["fallbacks"] == 1
+
+
+def test_failure_after_sending_is_an_error_result(server, monkeypatch):
+    monkeypatch.setattr(server, "_create", lambda payload: (500, {"error": {"message": {"value": "dump"}}}))
+    executor = make_executor(server.url)
+    result = executor.execute(qty())
+    assert result["status"] == "error"
+    assert "check SAP before retrying" in result["message"]
+    assert executor.stats["fallbacks"] == 0
+    assert executor.stats["uncertain"] == 1
@@ -0,0 +1,14 @@
+import pytest
+
+pytest.importorskip("selenium")
+
+from sap_robot.robot import parse_quantity
+
+
+def test_quantity_read_back_honours_ui_language():
+    assert parse_quantity("1.000", "de") == 1000.0
+    assert parse_quantity("1.000.000", "de") == 1000000.0
+    assert parse_quantity("1,000", "en") == 1000.0
+    assert parse_quantity("1,500", "de") == 1.5
+    assert parse_quantity("1.000,5", "de") == 1000.5
+    assert parse_quantity("1.5") == 1.5